@@ -8,14 +8,68 @@ This script is copied to workspace/scripts/ and called by agents.
 Usage:
     python scripts/find_papers.py "query about papers"
     python scripts/find_papers.py "query" --mode diligent
+    python scripts/find_papers.py --batch queries.txt --workers 4 --output paper_corpus.jsonl
 """
 
+import os
 import sys
 import json
+import time
+import hashlib
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 
+DEFAULT_URL = "http://localhost:8000/api/2/rounds"
+DEFAULT_CACHE_DIR = ".paper_cache"
+DEFAULT_TTL_HOURS = 24 * 7
 
-def find_papers(query: str, mode: str = "fast", url: str = "http://localhost:8000/api/2/rounds"):
+
+def _post_query(client, query: str, mode: str, url: str) -> dict:
+    """Send one paper-finder request and return the raw JSON response."""
+    response = client.post(url, json={
+        "paper_description": query,
+        "operation_mode": mode,
+        "read_results_from_cache": True
+    })
+    response.raise_for_status()
+    return response.json()
+
+
+def _error_result(e: Exception) -> dict:
+    error_type = type(e).__name__
+    if "ConnectError" in error_type or "Connection" in str(e):
+        return {
+            "error": "Paper-finder service not running at localhost:8000",
+            "fallback": True,
+            "message": "Proceeding with manual search (arXiv, Semantic Scholar, Papers with Code)"
+        }
+    return {"error": str(e), "fallback": True}
+
+
+def _format_doc(doc: dict, abstract_chars: int = 300) -> dict:
+    rel = doc.get('relevance_judgement', {}).get('relevance', 0)
+    authors = doc.get('authors', [])
+    author_str = ', '.join([a.get('name', '') for a in authors[:3]])
+    if len(authors) > 3:
+        author_str += ' et al.'
+
+    abstract = doc.get('abstract') or ''
+    return {
+        "title": doc.get('title', 'Unknown'),
+        "year": doc.get('year'),
+        "authors": author_str,
+        "url": doc.get('url', ''),
+        "relevance": rel,
+        "abstract": abstract[:abstract_chars] if abstract_chars else abstract,
+        "citations": doc.get('citation_count', 0) or 0
+    }
+
+
+def _documents(data: dict) -> list:
+    return data.get('doc_collection', {}).get('documents', [])
+
+
+def find_papers(query: str, mode: str = "fast", url: str = DEFAULT_URL):
     """Call paper-finder API and return formatted results."""
     try:
         import httpx
@@ -24,62 +78,186 @@ def find_papers(query: str, mode: str = "fast", url: str = "http://localhost:800
 
     try:
         with httpx.Client(timeout=300.0) as client:
-            response = client.post(url, json={
-                "paper_description": query,
-                "operation_mode": mode,
-                "read_results_from_cache": True
-            })
-            response.raise_for_status()
-            data = response.json()
+            data = _post_query(client, query, mode, url)
     except Exception as e:
-        error_type = type(e).__name__
-        if "ConnectError" in error_type or "Connection" in str(e):
-            return {
-                "error": "Paper-finder service not running at localhost:8000",
-                "fallback": True,
-                "message": "Proceeding with manual search (arXiv, Semantic Scholar, Papers with Code)"
-            }
-        return {"error": str(e), "fallback": True}
+        return _error_result(e)
 
     # Format results
-    docs = data.get('doc_collection', {}).get('documents', [])
+    docs = _documents(data)
     results = {
         "success": True,
         "total": len(docs),
-        "papers": []
+        "papers": [_format_doc(doc) for doc in docs[:15]]  # Top 15
     }
 
-    for doc in docs[:15]:  # Top 15
-        rel = doc.get('relevance_judgement', {}).get('relevance', 0)
-        authors = doc.get('authors', [])
-        author_str = ', '.join([a.get('name', '') for a in authors[:3]])
-        if len(authors) > 3:
-            author_str += ' et al.'
-
-        results["papers"].append({
-            "title": doc.get('title', 'Unknown'),
-            "year": doc.get('year'),
-            "authors": author_str,
-            "url": doc.get('url', ''),
-            "relevance": rel,
-            "abstract": (doc.get('abstract') or '')[:300],
-            "citations": doc.get('citation_count', 0) or 0
-        })
-
     return results
 
 
+class PaperCache:
+    """Persistent on-disk cache of raw paper-finder responses keyed by (query, mode)."""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, ttl_hours: float = DEFAULT_TTL_HOURS):
+        self.cache_dir = cache_dir
+        self.ttl = ttl_hours * 3600
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, query: str, mode: str) -> str:
+        key = hashlib.sha256(f"{mode}\n{query.strip()}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, query: str, mode: str):
+        """Return cached data if present and younger than the TTL, else None."""
+        path = self._path(query, mode)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get("fetched_at", 0) > self.ttl:
+            return None
+        return entry["data"]
+
+    def put(self, query: str, mode: str, data: dict):
+        path = self._path(query, mode)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"query": query, "mode": mode, "fetched_at": time.time(), "data": data}, f)
+        os.replace(tmp_path, path)
+
+
+def _paper_key(doc: dict) -> str:
+    if doc.get('corpus_id'):
+        return f"corpus:{doc['corpus_id']}"
+    if doc.get('url'):
+        return f"url:{doc['url']}"
+    return "title:" + " ".join((doc.get('title') or '').lower().split())
+
+
+def find_papers_batch(queries: list, mode: str = "fast", url: str = DEFAULT_URL, workers: int = 4,
+                      cache_dir: str = DEFAULT_CACHE_DIR, ttl_hours: float = DEFAULT_TTL_HOURS):
+    """
+    Run many queries concurrently with a bounded pool, reusing cached responses.
+    Documents are de-duplicated across queries and ranked by best relevance,
+    number of matching queries, then citations.
+    """
+    try:
+        import httpx
+    except ImportError:
+        return {"error": "httpx not installed. Install with: pip install httpx", "fallback": True}
+
+    queries = list(dict.fromkeys(q.strip() for q in queries if q.strip()))
+    cache = PaperCache(cache_dir, ttl_hours)
+    responses = {q: cache.get(q, mode) for q in queries}
+    pending = [q for q in queries if responses[q] is None]
+    errors = {}
+
+    if pending:
+        limits = httpx.Limits(max_connections=workers, max_keepalive_connections=workers)
+        with httpx.Client(timeout=300.0, limits=limits) as client:
+            def fetch(query):
+                try:
+                    return query, _post_query(client, query, mode, url), None
+                except Exception as e:
+                    return query, None, e
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for query, data, error in pool.map(fetch, pending):
+                    if error is not None:
+                        errors[query] = _error_result(error)
+                        continue
+                    cache.put(query, mode, data)
+                    responses[query] = data
+
+    if pending and len(errors) == len(queries):
+        return next(iter(errors.values()))
+
+    papers = {}
+    query_summary = {}
+    for query in queries:
+        if query in errors:
+            query_summary[query] = {"cached": False, "error": errors[query]["error"]}
+            continue
+        docs = _documents(responses[query])
+        query_summary[query] = {"cached": query not in pending, "total": len(docs)}
+        for doc in docs:
+            key = _paper_key(doc)
+            paper = papers.get(key)
+            if paper is None:
+                paper = papers[key] = {**_format_doc(doc, abstract_chars=None), "queries": []}
+            paper["relevance"] = max(paper["relevance"], doc.get('relevance_judgement', {}).get('relevance', 0))
+            paper["queries"].append(query)
+
+    ranked = sorted(papers.values(), key=lambda p: (-p["relevance"], -len(p["queries"]), -p["citations"]))
+    return {
+        "success": True,
+        "total": len(ranked),
+        "queries": query_summary,
+        "papers": ranked,
+    }
+
+
+def write_corpus(papers: list, path: str):
+    """Write ranked papers as a JSONL corpus (one paper per line)."""
+    with open(path, "w") as f:
+        for rank, paper in enumerate(papers, 1):
+            f.write(json.dumps({"rank": rank, **paper}) + "\n")
+
+
+def read_queries(path: str) -> list:
+    """Read one query per line, skipping blank lines and # comments."""
+    with open(path, "r") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def run_batch(args):
+    results = find_papers_batch(read_queries(args.batch), args.mode, args.url, args.workers,
+                                args.cache_dir, args.ttl)
+    if results.get("fallback"):
+        print(f"Paper-finder unavailable: {results.get('error', 'Unknown error')}")
+        sys.exit(1)
+
+    write_corpus(results["papers"], args.output)
+
+    if args.format == "json":
+        print(json.dumps(results, indent=2))
+        return
+
+    queries = results["queries"]
+    n_cached = sum(1 for q in queries.values() if q.get("cached"))
+    n_failed = sum(1 for q in queries.values() if "error" in q)
+    print(f"Queries: {len(queries)} ({n_cached} cached, {n_failed} failed)")
+    for query, summary in queries.items():
+        status = summary["error"] if "error" in summary else f"{summary['total']} papers"
+        print(f"  - {query}: {status}")
+    print(f"Unique papers: {results['total']} -> {args.output}")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Find academic papers")
-    parser.add_argument("query", help="Paper search query")
+    parser.add_argument("query", nargs="?", help="Paper search query")
     parser.add_argument("--mode", default="fast", choices=["fast", "diligent"],
                         help="Search mode: fast (~30s) or diligent (~3min)")
-    parser.add_argument("--url", default="http://localhost:8000/api/2/rounds",
+    parser.add_argument("--url", default=DEFAULT_URL,
                         help="Paper-finder API URL")
     parser.add_argument("--format", default="text", choices=["text", "json"],
                         help="Output format")
+    parser.add_argument("--batch", help="File with one query per line (runs queries concurrently)")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Maximum concurrent requests in batch mode")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help="Directory for cached responses in batch mode")
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL_HOURS,
+                        help="Cache time-to-live in hours")
+    parser.add_argument("--output", default="paper_corpus.jsonl",
+                        help="De-duplicated JSONL corpus written in batch mode")
     args = parser.parse_args()
 
+    if args.batch:
+        run_batch(args)
+        return
+    if not args.query:
+        parser.error("a query is required unless --batch is given")
+
     results = find_papers(args.query, args.mode, args.url)
 
     if args.format == "json":
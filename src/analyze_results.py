@@ -15,6 +15,27 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import textstat
 
+from embeddings import DEFAULT_CACHE_DIR, embed_texts, get_embedder, paired_cosine_distance, mean_cross_cosine_distance
+from records import ResultTable, TextStore
+from logprobs import LOGPROB_FEATURES, LogprobStore, response_statistics
+from mixed_effects import fit_style_mixed_models
+from near_duplicates import (DUPLICATE_THRESHOLD, build_response_index, duplicate_clusters_by_question,
+                             pairwise_jaccard)
+
+# Features tested for differences between prompt styles
+FEATURES = [
+    "word_count",
+    "sentence_count",
+    "avg_word_length",
+    "avg_sentence_length",
+    "type_token_ratio",
+    "flesch_reading_ease",
+    "flesch_kincaid_grade",
+    "formal_word_ratio",
+    "bullet_points",
+    "logical_connectors",
+]
+
 # Set style for plots
 plt.style.use('seaborn-v0_8-whitegrid')
 sns.set_palette("husl")
@@ -116,42 +137,184 @@ def extract_linguistic_features(text: str) -> dict:
     }
 
 
-def analyze_experiment(results: dict) -> pd.DataFrame:
+def _was_hedged(response) -> bool:
+    """True if a hedge was sent for the response (the faster, often shorter, reply is kept)."""
+    hedge = (response.extra or {}).get("hedge")
+    return bool(hedge and hedge.get("hedged"))
+
+
+def analyze_experiment(results) -> pd.DataFrame:
     """
     Analyze experiment results and extract features for all responses.
-    Returns DataFrame with features for analysis.
+    Accepts a loaded results dict or a ResultTable.
+    Returns DataFrame with features for analysis; prompts and responses are
+    referenced by index into the table's TextStore (*_ref columns).
+    hedged marks pairs where either response came from a hedged request.
     """
+    table = ResultTable.from_results(results)
+    feature_cache = {}
     rows = []
 
-    for r in results["results"]:
+    def features_for(ref):
+        if ref not in feature_cache:
+            feature_cache[ref] = extract_linguistic_features(table.text(ref))
+        return feature_cache[ref]
+
+    for record_idx, r in enumerate(table):
         # Skip failed responses
-        if not r["human_style_response"]["success"] or not r["llm_style_response"]["success"]:
+        if not r.success:
             continue
 
-        human_content = r["human_style_response"]["content"]
-        llm_content = r["llm_style_response"]["content"]
-
-        human_features = extract_linguistic_features(human_content)
-        llm_features = extract_linguistic_features(llm_content)
+        human_features = features_for(r.human_response.content_ref)
+        llm_features = features_for(r.llm_response.content_ref)
 
         row = {
-            "id": r["id"],
-            "topic": r["topic"],
-            "model": r["model"],
-            "base_question": r["base_question"],
+            "record_idx": record_idx,
+            "id": r.id,
+            "topic": r.topic,
+            "model": r.model,
+            "base_question": table.text(r.question_ref),
+            "hedged": _was_hedged(r.human_response) or _was_hedged(r.llm_response),
             # Human-style prompt response features
             **{f"human_{k}": v for k, v in human_features.items()},
             # LLM-style prompt response features
             **{f"llm_{k}": v for k, v in llm_features.items()},
-            # Raw content for reference
-            "human_response_content": human_content,
-            "llm_response_content": llm_content,
+            # References to prompts and content in the TextStore
+            "human_prompt_ref": r.human_prompt_ref,
+            "llm_prompt_ref": r.llm_prompt_ref,
+            "human_response_ref": r.human_response.content_ref,
+            "llm_response_ref": r.llm_response.content_ref,
         }
         rows.append(row)
 
     return pd.DataFrame(rows)
 
 
+def attach_text_columns(df: pd.DataFrame, store: TextStore) -> pd.DataFrame:
+    """Return a copy of df with prompt and response text columns resolved from the store."""
+    return df.assign(
+        human_style_prompt=[store.get(ref) for ref in df["human_prompt_ref"]],
+        llm_style_prompt=[store.get(ref) for ref in df["llm_prompt_ref"]],
+        human_response_content=[store.get(ref) for ref in df["human_response_ref"]],
+        llm_response_content=[store.get(ref) for ref in df["llm_response_ref"]],
+    )
+
+
+def add_semantic_features(df: pd.DataFrame, store: TextStore, embedder=None,
+                          cache_dir: str = DEFAULT_CACHE_DIR) -> pd.DataFrame:
+    """
+    Add semantic similarity columns comparing the paired responses (in place).
+    semantic_distance: cosine distance between the human-style and LLM-style response
+    semantic_baseline_distance: mean distance from the human-style response to the
+        LLM-style responses of other questions for the same model (reference level)
+    """
+    if len(df) == 0:
+        df["semantic_distance"] = []
+        df["semantic_baseline_distance"] = []
+        return df
+
+    n = len(df)
+    refs = np.concatenate([df["human_response_ref"].values, df["llm_response_ref"].values])
+    texts = [store.get(ref) for ref in refs]
+    vectors = embed_texts(texts, embedder=embedder, cache_dir=cache_dir)
+    human_vectors, llm_vectors = vectors[:n], vectors[n:]
+
+    df["semantic_distance"] = paired_cosine_distance(human_vectors, llm_vectors)
+
+    baseline = np.full(n, np.nan)
+    for model in df["model"].unique():
+        idx = np.flatnonzero((df["model"] == model).values)
+        if len(idx) < 2:
+            continue
+        baseline[idx] = mean_cross_cosine_distance(human_vectors[idx], llm_vectors[idx])
+    df["semantic_baseline_distance"] = baseline
+
+    return df
+
+
+def add_near_duplicate_features(df: pd.DataFrame, table: ResultTable,
+                                threshold: float = DUPLICATE_THRESHOLD) -> pd.DataFrame:
+    """
+    Add MinHash-based duplication features (in place).
+    {style}_template_echo: estimated Jaccard similarity between a response and its prompt
+    {style}_near_duplicates: responses from the same model to other questions (either
+        prompt style) whose estimated Jaccard similarity is at least threshold, i.e.
+        template-driven answers repeated across questions
+    paired_near_duplicate: the human-style and LLM-style responses to the question are
+        near-duplicates of each other
+    n_replicates: records for the same (model, question), e.g. from repeated sweeps
+    {style}_replicate_duplicates: other same-style replicates in the response's
+        near-duplicate cluster for the (model, question); NaN without replicates
+    {style}_replicate_diversity: 1 - mean pairwise similarity of the same-style
+        replicates of the (model, question); NaN without replicates
+    """
+    index = build_response_index(table)
+    prompt_signatures = {}
+
+    def prompt_signature(ref):
+        if ref not in prompt_signatures:
+            prompt_signatures[ref] = index.hasher.signature(table.text(ref))
+        return prompt_signatures[ref]
+
+    records = df["record_idx"].tolist()
+    for style in ("human", "llm"):
+        echo = [(index.signature_of((rec, style)) == prompt_signature(ref)).mean()
+                for rec, ref in zip(records, df[f"{style}_prompt_ref"])]
+        df[f"{style}_template_echo"] = echo
+
+        counts = []
+        for rec in records:
+            model, qid = table[rec].model, table[rec].id
+            matches = index.similar_to((rec, style), threshold)
+            counts.append(sum(1 for key, _ in matches
+                              if index.metadata[key]["model"] == model and index.metadata[key]["id"] != qid))
+        df[f"{style}_near_duplicates"] = counts
+
+    paired = [(index.signature_of((rec, "human")) == index.signature_of((rec, "llm"))).mean() for rec in records]
+    df["paired_near_duplicate"] = np.array(paired) >= threshold if len(df) else []
+
+    # Replicates: several records for the same (model, question)
+    df["n_replicates"] = df.groupby(["model", "id"])["record_idx"].transform("size") if len(df) else []
+    cluster_size = {}
+    for clusters in duplicate_clusters_by_question(index, threshold).values():
+        for cluster in clusters:
+            for key in cluster:
+                cluster_size[key] = sum(1 for other in cluster if other[1] == key[1]) - 1
+
+    for style in ("human", "llm"):
+        duplicates = np.full(len(df), np.nan)
+        diversity = np.full(len(df), np.nan)
+        for _, idx in df.groupby(["model", "id"]).indices.items():
+            if len(idx) < 2:
+                continue
+            keys = [(records[row], style) for row in idx]
+            duplicates[idx] = [cluster_size.get(key, 0) for key in keys]
+            sim = pairwise_jaccard(np.vstack([index.signature_of(key) for key in keys]))
+            diversity[idx] = 1.0 - (sim.sum() - len(idx)) / (len(idx) * (len(idx) - 1))
+        df[f"{style}_replicate_duplicates"] = duplicates
+        df[f"{style}_replicate_diversity"] = diversity
+
+    return df
+
+
+def add_logprob_features(df: pd.DataFrame, table: ResultTable, logprobs_path: str) -> pd.DataFrame:
+    """
+    Add per-response confidence features from the logprob sidecar (in place):
+    {style}_mean_entropy, {style}_perplexity and {style}_mean_logprob.
+    Responses without stored logprobs get NaN.
+    """
+    store = LogprobStore(logprobs_path)
+    for style in ("human", "llm"):
+        refs = []
+        for record_idx in df["record_idx"]:
+            extra = table[record_idx].response(style).extra or {}
+            refs.append(extra.get("logprobs_ref"))
+        stats_by_feature = response_statistics(store.read_many(refs))
+        for feature in LOGPROB_FEATURES:
+            df[f"{style}_{feature}"] = stats_by_feature[feature]
+    return df
+
+
 def compute_paired_statistics(df: pd.DataFrame, feature: str) -> dict:
     """
     Compute paired statistics for a feature between human and LLM style responses.
@@ -159,8 +322,10 @@ def compute_paired_statistics(df: pd.DataFrame, feature: str) -> dict:
     human_col = f"human_{feature}"
     llm_col = f"llm_{feature}"
 
-    human_values = df[human_col].values
-    llm_values = df[llm_col].values
+    # Rows missing either value (e.g. responses without logprobs) are excluded
+    paired = df[[human_col, llm_col]].dropna()
+    human_values = paired[human_col].values
+    llm_values = paired[llm_col].values
 
     # Differences
     diffs = llm_values - human_values
@@ -195,28 +360,59 @@ def compute_paired_statistics(df: pd.DataFrame, feature: str) -> dict:
     }
 
 
-def run_analysis(results: dict) -> tuple:
+def hedging_sensitivity(df: pd.DataFrame, features: list) -> pd.DataFrame:
     """
-    Run full analysis on experiment results.
+    Paired statistics recomputed without hedged pairs.
+    Hedging keeps the reply that finished first, so hedged responses tend to be
+    shorter; comparing against the full results shows whether that biases them.
+    """
+    unhedged = df[~df["hedged"]]
+    rows = []
+    for feature in features:
+        stat = compute_paired_statistics(unhedged, feature) if len(unhedged) > 1 else {"n": len(unhedged)}
+        rows.append({
+            "feature": feature,
+            "diff_mean_unhedged": stat.get("diff_mean", np.nan),
+            "cohens_d_unhedged": stat.get("cohens_d", np.nan),
+            "t_pvalue_unhedged": stat.get("t_pvalue", np.nan),
+            "n_unhedged": stat["n"],
+        })
+    return pd.DataFrame(rows)
+
+
+def run_analysis(results, embedder=None, logprobs_path: str = None, exclude_hedged: bool = False) -> tuple:
+    """
+    Run full analysis on experiment results (results dict or ResultTable).
+    When logprobs_path is given, confidence features from the logprob sidecar
+    are added to the tested features.
+    Pairs answered via hedged requests are dropped with exclude_hedged=True;
+    otherwise, if there are any, stats_df gets *_unhedged sensitivity columns.
     Returns (analysis_df, stats_df) tuple.
     """
+    table = ResultTable.from_results(results)
+
     # Extract features
-    df = analyze_experiment(results)
+    df = analyze_experiment(table)
     print(f"Analyzed {len(df)} successful response pairs")
 
+    n_hedged = int(df["hedged"].sum()) if len(df) else 0
+    if n_hedged and exclude_hedged:
+        df = df[~df["hedged"]].reset_index(drop=True)
+        print(f"Excluded {n_hedged} pairs answered via hedged requests")
+
+    # Semantic comparison of paired responses (embeddings are cached on disk)
+    add_semantic_features(df, table.store, embedder=embedder)
+
+    # Near-duplicate and template-echo detection (MinHash/LSH)
+    add_near_duplicate_features(df, table)
+
     # Features to analyze
-    features = [
-        "word_count",
-        "sentence_count",
-        "avg_word_length",
-        "avg_sentence_length",
-        "type_token_ratio",
-        "flesch_reading_ease",
-        "flesch_kincaid_grade",
-        "formal_word_ratio",
-        "bullet_points",
-        "logical_connectors",
-    ]
+    features = list(FEATURES)
+
+    # Model confidence features from stored logprobs
+    if logprobs_path:
+        add_logprob_features(df, table, logprobs_path)
+        features += [f for f in LOGPROB_FEATURES if df[f"human_{f}"].notna().any()]
 
     # Compute statistics for each feature
     stats_results = []
@@ -231,6 +427,10 @@ def run_analysis(results: dict) -> tuple:
     stats_df["t_pvalue_bonf"] = np.minimum(stats_df["t_pvalue"] * n_tests, 1.0)
     stats_df["significant_bonf"] = stats_df["t_pvalue_bonf"] < 0.05
 
+    # Sensitivity check: does keeping the fastest reply of hedged requests move the results?
+    if n_hedged and not exclude_hedged:
+        stats_df = stats_df.merge(hedging_sensitivity(df, features), on="feature")
+
     return df, stats_df
 
 
@@ -412,25 +612,76 @@ def print_summary_report(df: pd.DataFrame, stats_df: pd.DataFrame):
     largest_effect = stats_df.loc[stats_df['cohens_d'].abs().idxmax()]
     print(f"\nLargest effect: {largest_effect['feature']} (d = {largest_effect['cohens_d']:.3f})")
 
+    if "semantic_distance" in df.columns:
+        print("\n" + "-"*70)
+        print("SEMANTIC SIMILARITY (cosine distance between paired responses):")
+        print("-"*70)
+        for model, model_df in df.groupby("model"):
+            print(f"  {model}: paired = {model_df['semantic_distance'].mean():.3f}, "
+                  f"other questions = {model_df['semantic_baseline_distance'].mean():.3f}")
+
+    if "cohens_d_unhedged" in stats_df.columns:
+        print("\n" + "-"*70)
+        print(f"HEDGING SENSITIVITY ({int(df['hedged'].sum())} hedged pairs excluded):")
+        print("-"*70)
+        display_cols = ['feature', 'cohens_d', 'cohens_d_unhedged', 't_pvalue', 't_pvalue_unhedged']
+        print(stats_df[display_cols].to_string(index=False, float_format='%.3f'))
+
+    if "paired_near_duplicate" in df.columns:
+        print("\n" + "-"*70)
+        print("NEAR-DUPLICATES (MinHash/LSH):")
+        print("-"*70)
+        for model, model_df in df.groupby("model"):
+            n_dups = int(((model_df["human_near_duplicates"] > 0) | (model_df["llm_near_duplicates"] > 0)).sum())
+            n_paired = int(model_df["paired_near_duplicate"].sum())
+            line = (f"  {model}: questions with a near-duplicate from another question = {n_dups}, "
+                    f"near-identical pairs = {n_paired}")
+            if (model_df["n_replicates"] > 1).any():
+                diversity = model_df[["human_replicate_diversity", "llm_replicate_diversity"]].stack().mean()
+                line += f", replicate diversity = {diversity:.3f}"
+            print(line)
+
+
+def print_mixed_effects_report(mixed_df: pd.DataFrame):
+    """Print the style effects estimated by the mixed-effects model."""
+    print("\n" + "-"*70)
+    print("MIXED-EFFECTS MODEL (random intercepts for question and topic):")
+    print("-"*70)
+    overall = mixed_df[mixed_df["model"] == "(all models)"]
+    display_cols = ['feature', 'estimate', 'se', 'cohens_d', 'p_value', 'p_value_bonf',
+                    'sigma2_question', 'sigma2_topic']
+    print(overall[display_cols].to_string(index=False, float_format='%.3f'))
 
-def main():
+
+def main(embedder_name: str = "hashing", exclude_hedged: bool = False):
     """Main analysis function."""
     # Load results
     results = load_results()
     print(f"Loaded experiment results from {results['experiment_config']['timestamp']}")
+    config = results["experiment_config"]
+    table = ResultTable.from_results(results)
+    del results
 
     # Run analysis
-    df, stats_df = run_analysis(results)
+    df, stats_df = run_analysis(table, embedder=get_embedder(embedder_name),
+                                logprobs_path=config.get("logprobs_path"), exclude_hedged=exclude_hedged)
+
+    # Random-effects model of the style effect, fitted for all features together
+    features = stats_df["feature"].tolist()
+    mixed_df = fit_style_mixed_models(df.dropna(subset=[f"{p}_{f}" for f in features for p in ("human", "llm")]),
+                                      features)
 
     # Generate plots
     generate_plots(df, stats_df)
 
     # Print summary
     print_summary_report(df, stats_df)
+    print_mixed_effects_report(mixed_df)
 
     # Save analysis results
     stats_df.to_csv("results/statistical_analysis.csv", index=False)
-    df.to_csv("results/features_extracted.csv", index=False)
+    mixed_df.to_csv("results/mixed_effects.csv", index=False)
+    attach_text_columns(df, table.store).to_csv("results/features_extracted.csv", index=False)
     print("\nAnalysis files saved to results/")
 
     return df, stats_df
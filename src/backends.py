@@ -0,0 +1,219 @@
+"""
+Generation Backends
+
+OpenRouter API access (query_model and its async/hedged variants) and the
+ModelBackend interface that run_experiment generates through. Kept apart from
+the run_experiment script so other backends (local_backend, routing) can build
+on it without importing the script itself.
+"""
+
+import os
+import abc
+import time
+import asyncio
+import httpx
+
+from hedging import HedgingPolicy, hedged_call
+
+# Configuration
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+# Models to test
+MODELS = [
+    "openai/gpt-4.1-mini",       # GPT-4.1 mini for faster testing
+    "anthropic/claude-sonnet-4", # Claude Sonnet 4
+]
+
+# Sampling parameters
+TEMPERATURE = 0.7
+MAX_TOKENS = 500
+TOP_P = 0.95
+
+# Random seed
+SEED = 42
+
+
+def _build_request(model: str, prompt: str, logprobs: bool = False, top_logprobs: int = 0,
+                   api_key: str = None) -> tuple:
+    """Return (headers, payload) for an OpenAI-compatible chat completion request."""
+    headers = {
+        "Content-Type": "application/json",
+        "HTTP-Referer": "https://research.experiment.local",
+        "X-Title": "LLM Human vs LLM Style Research"
+    }
+    key = api_key if api_key is not None else OPENROUTER_API_KEY
+    if key:
+        headers["Authorization"] = f"Bearer {key}"
+
+    data = {
+        "model": model,
+        "messages": [
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": TEMPERATURE,
+        "max_tokens": MAX_TOKENS,
+        "top_p": TOP_P,
+    }
+    if logprobs:
+        data["logprobs"] = True
+        if top_logprobs:
+            data["top_logprobs"] = top_logprobs
+
+    return headers, data
+
+
+def _parse_completion(result: dict, model: str, logprobs: bool = False) -> dict:
+    """Convert a chat completion JSON body into a response dict."""
+    output = {
+        "success": True,
+        "content": result["choices"][0]["message"]["content"],
+        "model": result.get("model", model),
+        "usage": result.get("usage", {}),
+        "finish_reason": result["choices"][0].get("finish_reason", "unknown"),
+    }
+    if logprobs:
+        output["logprobs"] = result["choices"][0].get("logprobs")
+    return output
+
+
+def _error_response(error: str) -> dict:
+    return {
+        "success": False,
+        "error": error,
+        "content": None,
+    }
+
+
+def query_model(model: str, prompt: str, max_retries: int = 3,
+                logprobs: bool = False, top_logprobs: int = 0,
+                url: str = OPENROUTER_BASE_URL, api_key: str = None) -> dict:
+    """
+    Query a model via OpenRouter API (or another OpenAI-compatible endpoint at url).
+    Returns response dict with content and metadata.
+    With logprobs=True the raw per-token logprobs object is included under "logprobs".
+    """
+    headers, data = _build_request(model, prompt, logprobs, top_logprobs, api_key)
+
+    for attempt in range(max_retries):
+        try:
+            with httpx.Client(timeout=60.0) as client:
+                response = client.post(url, headers=headers, json=data)
+                response.raise_for_status()
+                return _parse_completion(response.json(), model, logprobs)
+
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 429:
+                if attempt == max_retries - 1:
+                    break  # No point waiting after the last attempt
+                wait_time = 2 ** (attempt + 1)  # Exponential backoff
+                print(f"Rate limited. Waiting {wait_time}s...")
+                time.sleep(wait_time)
+            else:
+                return _error_response(f"HTTP {e.response.status_code}: {str(e)}")
+        except Exception as e:
+            return _error_response(str(e))
+
+    return _error_response("Max retries exceeded")
+
+
+async def aquery_model(client: httpx.AsyncClient, model: str, prompt: str, max_retries: int = 3,
+                       logprobs: bool = False, top_logprobs: int = 0,
+                       url: str = OPENROUTER_BASE_URL, api_key: str = None) -> dict:
+    """Async variant of query_model; cancelling the task aborts the HTTP request."""
+    headers, data = _build_request(model, prompt, logprobs, top_logprobs, api_key)
+
+    for attempt in range(max_retries):
+        try:
+            response = await client.post(url, headers=headers, json=data)
+            response.raise_for_status()
+            return _parse_completion(response.json(), model, logprobs)
+
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 429:
+                if attempt == max_retries - 1:
+                    break  # No point waiting after the last attempt
+                wait_time = 2 ** (attempt + 1)  # Exponential backoff
+                print(f"Rate limited. Waiting {wait_time}s...")
+                await asyncio.sleep(wait_time)
+            else:
+                return _error_response(f"HTTP {e.response.status_code}: {str(e)}")
+        except Exception as e:
+            return _error_response(str(e))
+
+    return _error_response("Max retries exceeded")
+
+
+def query_model_hedged(model: str, prompt: str, policy: HedgingPolicy, **options) -> dict:
+    """
+    Query a model with request hedging: a duplicate is sent if the first request
+    is slower than the policy's learned latency percentile; the loser is cancelled.
+    """
+    async def run():
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            return await hedged_call(lambda: aquery_model(client, model, prompt, **options), policy)
+
+    return asyncio.run(run())
+
+
+class ModelBackend(abc.ABC):
+    """
+    Interface for generation backends used by run_experiment.
+    generate() returns one query_model-style response dict per prompt;
+    generate_batches() yields them as they finish so results can be written early.
+    run_experiment passes each pair's prompts next to each other:
+    prompts[2k] is human-style and prompts[2k + 1] LLM-style.
+    """
+    name = "base"
+    pairs_per_call = 1  # Prompt pairs handed to generate() at once (None = all of a model's pairs)
+
+    def default_models(self) -> list:
+        return MODELS
+
+    @abc.abstractmethod
+    def generate(self, model: str, prompts: list) -> list:
+        """Generate one response dict per prompt, in order."""
+
+    def generate_batches(self, model: str, prompts: list):
+        """Yield (prompt indices, responses) as batches finish; by default one batch."""
+        yield list(range(len(prompts))), self.generate(model, prompts)
+
+    def describe(self) -> dict:
+        """Backend settings and statistics saved in the experiment config."""
+        return {"name": self.name}
+
+    def print_report(self):
+        pass
+
+
+class OpenRouterBackend(ModelBackend):
+    """Sends each prompt to OpenRouter with query_model (optionally hedged)."""
+    name = "openrouter"
+
+    def __init__(self, logprobs: bool = False, top_logprobs: int = 0,
+                 hedging: HedgingPolicy = None, delay: float = 0.5):
+        self.query_options = {"logprobs": logprobs, "top_logprobs": top_logprobs if logprobs else 0}
+        self.hedging = hedging
+        self.delay = delay
+
+    def generate(self, model: str, prompts: list) -> list:
+        responses = []
+        for prompt in prompts:
+            if self.hedging is not None:
+                responses.append(query_model_hedged(model, prompt, self.hedging, **self.query_options))
+            else:
+                responses.append(query_model(model, prompt, **self.query_options))
+            time.sleep(self.delay)  # Small delay to avoid rate limiting
+        return responses
+
+    def describe(self) -> dict:
+        return {
+            "name": self.name,
+            "hedging": self.hedging.summary() if self.hedging is not None else None,
+        }
+
+    def print_report(self):
+        if self.hedging is not None:
+            summary = self.hedging.summary()
+            print(f"Hedged requests: {summary['hedged']}/{summary['requests']} "
+                  f"(hedge won {summary['hedge_wins']}, cancelled {summary['cancelled']})")
@@ -0,0 +1,212 @@
+"""
+Embedding Cache Module
+
+Embeds response texts for semantic comparison of paired responses.
+Vectors are kept in a memory-mapped NumPy store keyed by content hash, so
+re-running the analysis never re-embeds text that has already been seen.
+
+Two local CPU embedders are available:
+1. Hashing: TF-style hashing vectorizer (no model download, default)
+2. Transformer: mean-pooled hidden states of a small local encoder
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+
+DEFAULT_CACHE_DIR = "results/embedding_cache"
+DEFAULT_TRANSFORMER_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+HASHING_DIM = 1024
+
+
+def content_hash(text: str) -> str:
+    """Return a stable hash of the text used as cache key."""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+class HashingEmbedder:
+    """Bag-of-ngrams embedder based on scikit-learn's HashingVectorizer."""
+
+    def __init__(self, n_features: int = HASHING_DIM):
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.name = f"hashing-{n_features}"
+        self.dim = n_features
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            ngram_range=(1, 2),
+            stop_words="english",
+            alternate_sign=False,
+            norm="l2",
+        )
+
+    def embed(self, texts: list) -> np.ndarray:
+        return self.vectorizer.transform(texts).toarray().astype(np.float32)
+
+
+class TransformerEmbedder:
+    """Mean-pooled sentence embeddings from a local transformer encoder (CPU)."""
+
+    def __init__(self, model_name: str = DEFAULT_TRANSFORMER_MODEL, batch_size: int = 32):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        self.torch = torch
+        self.name = model_name
+        self.batch_size = batch_size
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).eval()
+        self.dim = self.model.config.hidden_size
+
+    def embed(self, texts: list) -> np.ndarray:
+        torch = self.torch
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+
+        with torch.no_grad():
+            for start in range(0, len(texts), self.batch_size):
+                batch = texts[start:start + self.batch_size]
+                encoded = self.tokenizer(batch, padding=True, truncation=True, return_tensors="pt")
+                hidden = self.model(**encoded).last_hidden_state
+                mask = encoded["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+                out[start:start + len(batch)] = pooled.numpy()
+
+        return out
+
+
+def get_embedder(name: str = "hashing"):
+    """Return an embedder by name ("hashing" or a local transformer model id)."""
+    if name == "hashing":
+        return HashingEmbedder()
+    return TransformerEmbedder(name)
+
+
+class EmbeddingCache:
+    """
+    Memory-mapped embedding store keyed by content hash.
+    Each embedder gets its own directory holding vectors.npy and index.json.
+    """
+
+    def __init__(self, cache_dir: str, embedder_name: str, dim: int):
+        safe_name = embedder_name.replace("/", "__")
+        self.path = os.path.join(cache_dir, safe_name)
+        self.vectors_path = os.path.join(self.path, "vectors.npy")
+        self.index_path = os.path.join(self.path, "index.json")
+        self.dim = dim
+        os.makedirs(self.path, exist_ok=True)
+
+        self.keys = {}
+        self.count = 0
+        self.vectors = None
+
+        if os.path.exists(self.index_path) and os.path.exists(self.vectors_path):
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+            if index.get("dim") == dim:
+                self.keys = index["keys"]
+                self.count = index["count"]
+                self.vectors = np.load(self.vectors_path, mmap_mode="r+")
+
+    def __len__(self):
+        return self.count
+
+    def lookup(self, hashes: list) -> np.ndarray:
+        """Return cache rows for the given hashes (-1 where missing)."""
+        return np.array([self.keys.get(h, -1) for h in hashes], dtype=np.int64)
+
+    def get(self, rows: np.ndarray) -> np.ndarray:
+        """Read the vectors stored at the given rows."""
+        return np.asarray(self.vectors[rows])
+
+    def add(self, hashes: list, vectors: np.ndarray):
+        """Append new vectors, growing the memory-mapped file when full."""
+        if len(hashes) == 0:
+            return
+        self._reserve(self.count + len(hashes))
+
+        self.vectors[self.count:self.count + len(hashes)] = vectors
+        for i, h in enumerate(hashes):
+            self.keys[h] = self.count + i
+        self.count += len(hashes)
+        self.flush()
+
+    def flush(self):
+        """Write vectors and index to disk."""
+        if self.vectors is not None:
+            self.vectors.flush()
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"dim": self.dim, "count": self.count, "keys": self.keys}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _reserve(self, needed: int):
+        capacity = 0 if self.vectors is None else self.vectors.shape[0]
+        if needed <= capacity:
+            return
+
+        new_capacity = max(needed, 2 * capacity, 256)
+        tmp_path = self.vectors_path + ".tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32,
+                                          shape=(new_capacity, self.dim))
+        if self.count > 0:
+            grown[:self.count] = self.vectors[:self.count]
+        grown.flush()
+        del grown
+        self.vectors = None
+        os.replace(tmp_path, self.vectors_path)
+        self.vectors = np.load(self.vectors_path, mmap_mode="r+")
+
+
+def embed_texts(texts: list, embedder=None, cache_dir: str = DEFAULT_CACHE_DIR) -> np.ndarray:
+    """
+    Embed texts, reusing cached vectors where possible.
+    Only texts whose content hash is not in the cache are sent to the embedder,
+    and they are embedded together in a single batch.
+    """
+    if embedder is None:
+        embedder = HashingEmbedder()
+
+    cache = EmbeddingCache(cache_dir, embedder.name, embedder.dim)
+    hashes = [content_hash(t) for t in texts]
+    rows = cache.lookup(hashes)
+
+    missing = {}
+    for h, t, row in zip(hashes, texts, rows):
+        if row < 0 and h not in missing:
+            missing[h] = t or ""
+
+    if missing:
+        print(f"Embedding {len(missing)} new texts ({len(texts) - int((rows < 0).sum())} cached)")
+        cache.add(list(missing.keys()), embedder.embed(list(missing.values())))
+        rows = cache.lookup(hashes)
+
+    return cache.get(rows)
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row (zero rows stay zero)."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def paired_cosine_distance(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Cosine distance between row i of a and row i of b."""
+    return 1.0 - np.einsum("ij,ij->i", normalize_rows(a), normalize_rows(b))
+
+
+def cross_cosine_distance(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Matrix of cosine distances between every row of a and every row of b."""
+    return 1.0 - normalize_rows(a) @ normalize_rows(b).T
+
+
+def mean_cross_cosine_distance(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Mean cosine distance from each row a_i to the rows b_j with j != i
+    (a and b are paired row by row), computed in O(n * d) without the n x n matrix.
+    """
+    n = len(a)
+    a, b = normalize_rows(a), normalize_rows(b)
+    others = b.sum(axis=0)[None, :] - b
+    return 1.0 - np.einsum("ij,ij->i", a, others) / (n - 1)
+
@@ -0,0 +1,130 @@
+"""
+Request Hedging Module
+
+Cuts tail latency of slow completions: if a request has not finished after a
+latency percentile learned from the run's own history, a duplicate is sent.
+The first successful reply wins and the other attempt is cancelled.
+
+Every hedge and cancellation is counted so the extra cost stays visible, and
+cancelled attempts still contribute their elapsed time to the latency history
+so the learned percentile is not biased towards fast replies. Failed attempts
+are left out of the history, since fast errors would pull the percentile down.
+
+The kept response is the one that finished first, which favours shorter
+answers; each response is marked with a "hedge" record so the analysis can
+check the results without hedged pairs (see analyze_results.run_analysis).
+"""
+
+import time
+import asyncio
+import numpy as np
+
+HEDGE_PERCENTILE = 95
+MIN_LATENCY_SAMPLES = 10
+
+
+class HedgingPolicy:
+    """
+    Learns the hedge delay from observed latencies.
+    No hedges are sent until min_samples latencies have been recorded
+    (unless initial_delay is given).
+    """
+
+    def __init__(self, percentile: float = HEDGE_PERCENTILE, min_samples: int = MIN_LATENCY_SAMPLES,
+                 initial_delay: float = None):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.latencies = []
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.cancelled = 0
+
+    def record(self, latency: float):
+        self.latencies.append(latency)
+
+    def delay(self):
+        """Seconds to wait before hedging (None = do not hedge)."""
+        if len(self.latencies) < self.min_samples:
+            return self.initial_delay
+        return float(np.percentile(self.latencies, self.percentile))
+
+    def summary(self) -> dict:
+        return {
+            "percentile": self.percentile,
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "cancelled": self.cancelled,
+            "current_delay_s": self.delay(),
+        }
+
+
+async def _timed(make_attempt):
+    start = time.monotonic()
+    result = await make_attempt()
+    return result, time.monotonic() - start
+
+
+async def hedged_call(make_attempt, policy: HedgingPolicy) -> dict:
+    """
+    Run make_attempt() (a coroutine factory returning a query_model-style dict),
+    sending one duplicate if the first attempt is slower than policy.delay().
+    The returned dict carries "latency_s" and a "hedge" record.
+    """
+    policy.requests += 1
+    start = time.monotonic()
+    delay = policy.delay()
+
+    primary = asyncio.create_task(_timed(make_attempt))
+    names = {primary: "primary"}
+    started = {primary: start}
+
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if not done:
+        hedge = asyncio.create_task(_timed(make_attempt))
+        names[hedge] = "hedge"
+        started[hedge] = time.monotonic()
+        policy.hedged += 1
+
+    winner = None
+    failures = []
+    pending = set(names)
+    while pending and winner is None:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            result, latency = task.result()
+            if result.get("success"):
+                policy.record(latency)
+            if result.get("success") and winner is None:
+                winner = (task, result)
+            else:
+                failures.append((task, result))
+
+    cancelled = 0
+    for task in pending:
+        task.cancel()
+        policy.record(time.monotonic() - started[task])
+        cancelled += 1
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+    policy.cancelled += cancelled
+
+    if winner is not None:
+        task, result = winner
+        winner_name = names[task]
+        if winner_name == "hedge":
+            policy.hedge_wins += 1
+    else:
+        _, result = failures[-1]
+        winner_name = None  # Every attempt failed
+
+    result["latency_s"] = time.monotonic() - start
+    result["hedge"] = {
+        "hedged": len(names) > 1,
+        "winner": winner_name,
+        "cancelled": cancelled,
+        "delay_s": delay,
+    }
+    return result
@@ -0,0 +1,258 @@
+"""
+Live Analysis Script
+
+Follows the JSONL stream written by run_experiment while a sweep is running.
+Features are extracted only for new records, and paired statistics are kept
+as running sums and sums of squares per (model, feature). Each batch of new
+records is summarized separately and merged into the running totals, and the
+all-models view is built by merging the per-model summaries, so nothing is
+recomputed from scratch. When run_experiment starts a new sweep (the stream's
+first line changes), the summary starts over.
+
+Usage:
+    python src/live_analysis.py
+    python src/live_analysis.py --interval 10 --html results/live_summary.html
+"""
+
+import os
+import time
+import json
+import argparse
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+
+from analyze_results import FEATURES, extract_linguistic_features
+from records import STREAM_PATH
+
+ALL_MODELS = "(all models)"
+
+
+@dataclass(slots=True)
+class RunningStats:
+    """Running sums for paired (human-style, LLM-style) values of one feature."""
+    n: int = 0
+    sum_human: float = 0.0
+    sumsq_human: float = 0.0
+    sum_llm: float = 0.0
+    sumsq_llm: float = 0.0
+    sum_diff: float = 0.0
+    sumsq_diff: float = 0.0
+
+    @classmethod
+    def from_values(cls, human: np.ndarray, llm: np.ndarray) -> "RunningStats":
+        human = np.asarray(human, dtype=np.float64)
+        llm = np.asarray(llm, dtype=np.float64)
+        diff = llm - human
+        return cls(
+            n=len(diff),
+            sum_human=human.sum(),
+            sumsq_human=(human ** 2).sum(),
+            sum_llm=llm.sum(),
+            sumsq_llm=(llm ** 2).sum(),
+            sum_diff=diff.sum(),
+            sumsq_diff=(diff ** 2).sum(),
+        )
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        return RunningStats(
+            n=self.n + other.n,
+            sum_human=self.sum_human + other.sum_human,
+            sumsq_human=self.sumsq_human + other.sumsq_human,
+            sum_llm=self.sum_llm + other.sum_llm,
+            sumsq_llm=self.sumsq_llm + other.sumsq_llm,
+            sum_diff=self.sum_diff + other.sum_diff,
+            sumsq_diff=self.sumsq_diff + other.sumsq_diff,
+        )
+
+    @staticmethod
+    def _mean(total: float, n: int) -> float:
+        return total / n if n > 0 else np.nan
+
+    @staticmethod
+    def _std(total: float, total_sq: float, n: int) -> float:
+        if n < 2:
+            return np.nan
+        return np.sqrt(max(total_sq - total * total / n, 0.0) / (n - 1))
+
+    def summary(self) -> dict:
+        diff_std = self._std(self.sum_diff, self.sumsq_diff, self.n)
+        diff_mean = self._mean(self.sum_diff, self.n)
+        return {
+            "n": self.n,
+            "human_mean": self._mean(self.sum_human, self.n),
+            "llm_mean": self._mean(self.sum_llm, self.n),
+            "diff_mean": diff_mean,
+            "diff_std": diff_std,
+            # Cohen's d for paired samples, as in compute_paired_statistics
+            "cohens_d": diff_mean / diff_std if diff_std and diff_std > 0 else 0.0,
+        }
+
+
+def _first_line(f):
+    """First complete line of the file (None if there is none yet)."""
+    f.seek(0)
+    line = f.readline()
+    return line if line.endswith(b"\n") else None
+
+
+def tail_jsonl(path: str, offset: int = 0, sweep: bytes = None) -> tuple:
+    """
+    Read complete JSONL lines appended after offset.
+    sweep identifies the sweep being followed by the stream's first line (each
+    record carries its own timestamp). When the file shrank or its first line
+    changed, a new sweep has started and reading restarts from the beginning.
+    Returns (records, new_offset, sweep, new_sweep); a trailing partial line is
+    left for the next call and lines that do not parse are skipped.
+    """
+    if not os.path.exists(path):
+        return [], offset, sweep, False
+
+    with open(path, "rb") as f:
+        first = _first_line(f)
+        new_sweep = os.fstat(f.fileno()).st_size < offset or (
+            sweep is not None and first is not None and first != sweep)
+        if new_sweep:
+            offset = 0
+        f.seek(offset)
+        chunk = f.read()
+
+    end = chunk.rfind(b"\n") + 1
+    records = []
+    for line in chunk[:end].splitlines():
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    if first is not None or new_sweep:
+        sweep = first
+    return records, offset + end, sweep, new_sweep
+
+
+class LiveAnalyzer:
+    """Incrementally updated paired statistics per (model, feature)."""
+
+    def __init__(self, features: list = None):
+        self.features = list(features or FEATURES)
+        self.stats = {}
+        self.n_records = 0
+        self.n_failed = 0
+
+    def update(self, records: list):
+        """Extract features for new records and merge their partial summary."""
+        values = {}
+        for r in records:
+            self.n_records += 1
+            if not r["human_style_response"]["success"] or not r["llm_style_response"]["success"]:
+                self.n_failed += 1
+                continue
+            human = extract_linguistic_features(r["human_style_response"]["content"])
+            llm = extract_linguistic_features(r["llm_style_response"]["content"])
+            rows = values.setdefault(r["model"], [])
+            rows.append([(human[f], llm[f]) for f in self.features])
+
+        for model, rows in values.items():
+            batch = np.array(rows, dtype=np.float64)  # (records, features, 2)
+            for j, feature in enumerate(self.features):
+                partial = RunningStats.from_values(batch[:, j, 0], batch[:, j, 1])
+                key = (model, feature)
+                self.stats[key] = self.stats.get(key, RunningStats()).merge(partial)
+
+    def summary(self) -> pd.DataFrame:
+        """Per-model rows plus an all-models row per feature (merged partial summaries)."""
+        rows = []
+        models = sorted({model for model, _ in self.stats})
+        for feature in self.features:
+            combined = RunningStats()
+            for model in models:
+                stat = self.stats.get((model, feature))
+                if stat is None:
+                    continue
+                combined = combined.merge(stat)
+                rows.append({"model": model, "feature": feature, **stat.summary()})
+            if len(models) > 1:
+                rows.append({"model": ALL_MODELS, "feature": feature, **combined.summary()})
+        return pd.DataFrame(rows)
+
+    def render_text(self) -> str:
+        header = (f"Live analysis at {time.strftime('%H:%M:%S')}: {self.n_records} records "
+                  f"({self.n_failed} failed)")
+        summary = self.summary()
+        if len(summary) == 0:
+            return header + "\nNo successful response pairs yet."
+        return header + "\n" + summary.to_string(index=False, float_format="%.3f")
+
+    def render_html(self) -> str:
+        summary = self.summary()
+        table = summary.to_html(index=False, float_format="%.3f") if len(summary) else "<p>No data yet.</p>"
+        return (
+            "<html><head><meta http-equiv=\"refresh\" content=\"10\">"
+            "<title>Live analysis</title></head><body>"
+            f"<h2>Live analysis</h2><p>Updated {time.strftime('%Y-%m-%d %H:%M:%S')}: "
+            f"{self.n_records} records ({self.n_failed} failed)</p>{table}</body></html>"
+        )
+
+
+def run_live(path: str = STREAM_PATH, interval: float = 30.0, poll: float = 1.0,
+             html_path: str = None, idle_timeout: float = None) -> LiveAnalyzer:
+    """
+    Follow the sweep output and refresh the summary every interval seconds.
+    Stops after idle_timeout seconds without new records (or on Ctrl-C).
+    """
+    analyzer = LiveAnalyzer()
+    offset = 0
+    sweep = None
+    last_refresh = 0.0
+    last_record = time.time()
+    changed = False
+
+    try:
+        while True:
+            records, offset, sweep, new_sweep = tail_jsonl(path, offset, sweep)
+            if new_sweep:
+                print("New sweep detected, restarting the live summary\n")
+                analyzer = LiveAnalyzer()
+                changed = True
+            if records:
+                analyzer.update(records)
+                last_record = time.time()
+                changed = True
+
+            now = time.time()
+            if changed and now - last_refresh >= interval:
+                print(analyzer.render_text() + "\n")
+                if html_path:
+                    with open(html_path, "w") as f:
+                        f.write(analyzer.render_html())
+                last_refresh = now
+                changed = False
+
+            if idle_timeout is not None and now - last_record > idle_timeout:
+                break
+            time.sleep(poll)
+    except KeyboardInterrupt:
+        pass
+
+    print(analyzer.render_text())
+    if html_path:
+        with open(html_path, "w") as f:
+            f.write(analyzer.render_html())
+    return analyzer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live analysis of a running sweep")
+    parser.add_argument("--path", default=STREAM_PATH, help="JSONL stream written by run_experiment")
+    parser.add_argument("--interval", type=float, default=30.0, help="Seconds between summary refreshes")
+    parser.add_argument("--html", default=None, help="Also write an HTML summary to this path")
+    parser.add_argument("--idle-timeout", type=float, default=None,
+                        help="Stop after this many seconds without new records")
+    args = parser.parse_args()
+
+    run_live(args.path, args.interval, html_path=args.html, idle_timeout=args.idle_timeout)
+
+
+if __name__ == "__main__":
+    main()
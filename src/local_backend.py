@@ -0,0 +1,263 @@
+"""
+Local Model Backend
+
+In-process CPU generation with a small causal LM, so the human-vs-LLM-style
+pipeline can run offline, in CI or on sensitive prompts.
+
+The model is loaded once and receives all of a model's prompts in one call;
+responses are handed back batch by batch as each padded batch finishes.
+Prompts are grouped by the HUMAN_STYLE_TEMPLATES / LLM_STYLE_TEMPLATES prefix
+they start with (after the shared chat header) and batched within each group;
+prompts without a template prefix are batched together. The KV-cache of a
+batch's shared token prefix (chat header + template prefix) is computed once
+for a single row, repeated across the batch, and reused by later batches with
+the same prefix. Generated tokens/sec is tracked per batch size.
+
+Usage:
+    python src/run_experiment.py --backend local --num-questions 5
+    python src/run_experiment.py --backend local --batch-size 16
+"""
+
+import copy
+import time
+from collections import OrderedDict, deque
+
+from backends import ModelBackend, TEMPERATURE, MAX_TOKENS, TOP_P, SEED
+
+DEFAULT_LOCAL_MODEL = "HuggingFaceTB/SmolLM2-135M-Instruct"
+MIN_PREFIX_TOKENS = 8
+TEMPLATE_PREFIX_TOKENS = 4  # Tokens past the chat header that prompts must share to be grouped
+MAX_CACHED_PREFIXES = 32
+
+
+def _common_prefix_length(sequences: list) -> int:
+    first = sequences[0]
+    length = min(len(s) for s in sequences)
+    for i in range(length):
+        if any(s[i] != first[i] for s in sequences[1:]):
+            return i
+    return length
+
+
+def group_by_prefix(encoded: list, min_shared: int) -> list:
+    """
+    Group prompt indices whose token ids share at least min_shared leading tokens.
+    Sorting by token ids makes such prompts adjacent. Returns lists of indices.
+    """
+    order = sorted(range(len(encoded)), key=lambda i: encoded[i])
+    groups = []
+    for i in order:
+        if groups and _common_prefix_length([encoded[groups[-1][0]], encoded[i]]) >= min_shared:
+            groups[-1].append(i)
+        else:
+            groups.append([i])
+    return groups
+
+
+def _pair_order(batches: list) -> list:
+    """
+    Order batches so each is soon followed by the batches holding its prompts'
+    pair partners (2k <-> 2k + 1); pairs then complete, and can be written,
+    while the sweep is running instead of only at its end.
+    """
+    batch_of = {i: b for b, batch in enumerate(batches) for i in batch}
+    order = []
+    seen = set()
+    for first in range(len(batches)):
+        queue = deque([first])
+        while queue:
+            b = queue.popleft()
+            if b in seen:
+                continue
+            seen.add(b)
+            order.append(batches[b])
+            queue.extend(batch_of[i ^ 1] for i in batches[b] if (i ^ 1) in batch_of)
+    return order
+
+
+class LocalCausalLMBackend(ModelBackend):
+    """Batched CPU generation with a local Hugging Face causal LM."""
+    name = "local"
+    pairs_per_call = None  # All of a model's prompts at once, so they can be grouped by template
+
+    def __init__(self, model_name: str = DEFAULT_LOCAL_MODEL, batch_size: int = 8,
+                 max_new_tokens: int = MAX_TOKENS, temperature: float = TEMPERATURE,
+                 top_p: float = TOP_P, seed: int = SEED, reuse_prefix_cache: bool = True):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        self.torch = torch
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        self.reuse_prefix_cache = reuse_prefix_cache
+
+        torch.manual_seed(seed)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForCausalLM.from_pretrained(model_name, dtype=torch.float32).eval()
+        self.pad_id = self.tokenizer.pad_token_id
+        if self.pad_id is None:
+            self.pad_id = self.tokenizer.eos_token_id
+        self.eos_id = self.tokenizer.eos_token_id
+
+        self._prefix_cache = OrderedDict()
+        self.prefix_cache_hits = 0
+        self.prefix_cache_misses = 0
+        self.prefix_tokens_reused = 0
+        self.throughput = {}  # batch size -> [generated tokens, seconds]
+
+    def default_models(self) -> list:
+        return [self.model_name]
+
+    def _encode(self, prompt: str) -> list:
+        if self.tokenizer.chat_template:
+            text = self.tokenizer.apply_chat_template(
+                [{"role": "user", "content": prompt}], tokenize=False, add_generation_prompt=True
+            )
+            return self.tokenizer(text, add_special_tokens=False)["input_ids"]
+        return self.tokenizer(prompt)["input_ids"]
+
+    def _prefix_kv(self, prefix: list, batch_size: int):
+        """KV-cache for the prefix repeated batch_size times (computed once for one row)."""
+        torch = self.torch
+        key = tuple(prefix)
+        cached = self._prefix_cache.get(key)
+        if cached is None:
+            self.prefix_cache_misses += 1
+            self.prefix_tokens_reused += len(prefix) * (batch_size - 1)
+            with torch.no_grad():
+                cached = self.model(input_ids=torch.tensor([prefix]), use_cache=True).past_key_values
+            self._prefix_cache[key] = cached
+            if len(self._prefix_cache) > MAX_CACHED_PREFIXES:
+                self._prefix_cache.popitem(last=False)
+        else:
+            self.prefix_cache_hits += 1
+            self.prefix_tokens_reused += len(prefix) * batch_size
+            self._prefix_cache.move_to_end(key)
+        # generate() extends the cache in place, so hand it a copy
+        kv = copy.deepcopy(cached)
+        kv.batch_repeat_interleave(batch_size)
+        return kv
+
+    def _generate_batch(self, batch: list) -> list:
+        """
+        Generate for a batch of token id lists.
+        Layout per row: [shared prefix][padding][own suffix]; padding is masked out
+        and position ids follow the attention mask, so the cached prefix stays valid.
+        """
+        torch = self.torch
+        prefix_len = 0
+        if self.reuse_prefix_cache:
+            prefix_len = min(_common_prefix_length(batch), min(len(ids) for ids in batch) - 1)
+            if prefix_len < MIN_PREFIX_TOKENS:
+                prefix_len = 0
+
+        suffixes = [ids[prefix_len:] for ids in batch]
+        width = prefix_len + max(len(s) for s in suffixes)
+        input_ids = torch.full((len(batch), width), self.pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(batch), width), dtype=torch.long)
+        for row, (ids, suffix) in enumerate(zip(batch, suffixes)):
+            input_ids[row, :prefix_len] = torch.tensor(ids[:prefix_len], dtype=torch.long)
+            attention_mask[row, :prefix_len] = 1
+            input_ids[row, width - len(suffix):] = torch.tensor(suffix, dtype=torch.long)
+            attention_mask[row, width - len(suffix):] = 1
+
+        options = {
+            "attention_mask": attention_mask,
+            "max_new_tokens": self.max_new_tokens,
+            "do_sample": self.temperature > 0,
+            "pad_token_id": self.pad_id,
+        }
+        if self.temperature > 0:
+            options.update(temperature=self.temperature, top_p=self.top_p)
+        if prefix_len:
+            options["past_key_values"] = self._prefix_kv(batch[0][:prefix_len], len(batch))
+
+        start = time.perf_counter()
+        with torch.no_grad():
+            output = self.model.generate(input_ids=input_ids, **options)
+        elapsed = time.perf_counter() - start
+
+        responses = []
+        generated_total = 0
+        for row, ids in enumerate(batch):
+            new_tokens = output[row, width:].tolist()
+            finish_reason = "length"
+            if self.eos_id is not None and self.eos_id in new_tokens:
+                new_tokens = new_tokens[:new_tokens.index(self.eos_id)]
+                finish_reason = "stop"
+            generated_total += len(new_tokens)
+            responses.append({
+                "success": True,
+                "content": self.tokenizer.decode(new_tokens, skip_special_tokens=True).strip(),
+                "model": self.model_name,
+                "usage": {"prompt_tokens": len(ids), "completion_tokens": len(new_tokens),
+                          "cached_prompt_tokens": prefix_len},
+                "finish_reason": finish_reason,
+            })
+
+        stats = self.throughput.setdefault(len(batch), [0, 0.0])
+        stats[0] += generated_total
+        stats[1] += elapsed
+        return responses
+
+    def _batches(self, encoded: list) -> list:
+        """
+        Index batches of at most batch_size prompts. Prompts sharing a template
+        prefix are batched together; the rest share batches with each other.
+        """
+        if len(encoded) < 2:
+            return [list(range(len(encoded)))]
+        header = _common_prefix_length(encoded)
+        batches, rest = [], []
+        for group in group_by_prefix(encoded, header + TEMPLATE_PREFIX_TOKENS):
+            chunks = [group[i:i + self.batch_size] for i in range(0, len(group), self.batch_size)]
+            if len(chunks[-1]) == 1:
+                rest += chunks.pop()  # A lone prompt gains nothing from its own batch
+            batches += chunks
+        batches += [rest[i:i + self.batch_size] for i in range(0, len(rest), self.batch_size)]
+        return batches
+
+    def generate(self, model: str, prompts: list) -> list:
+        responses = [None] * len(prompts)
+        for indices, batch_responses in self.generate_batches(model, prompts):
+            for i, response in zip(indices, batch_responses):
+                responses[i] = response
+        return responses
+
+    def generate_batches(self, model: str, prompts: list):
+        """Yield (prompt indices, responses) per padded batch, so results stream as batches finish."""
+        if model != self.model_name:
+            raise ValueError(f"Local backend has {self.model_name} loaded, not {model}")
+
+        encoded = [self._encode(p) for p in prompts]
+        for indices in _pair_order(self._batches(encoded)):
+            try:
+                batch_responses = self._generate_batch([encoded[i] for i in indices])
+            except Exception as e:
+                batch_responses = [{"success": False, "error": str(e), "content": None} for _ in indices]
+            yield indices, batch_responses
+
+    def tokens_per_second(self) -> dict:
+        """Generated tokens/sec per batch size."""
+        return {size: tokens / seconds if seconds > 0 else 0.0
+                for size, (tokens, seconds) in sorted(self.throughput.items())}
+
+    def describe(self) -> dict:
+        return {
+            "name": self.name,
+            "model": self.model_name,
+            "batch_size": self.batch_size,
+            "prefix_cache_hits": self.prefix_cache_hits,
+            "prefix_cache_misses": self.prefix_cache_misses,
+            "prefix_tokens_reused": self.prefix_tokens_reused,
+            "tokens_per_second": self.tokens_per_second(),
+        }
+
+    def print_report(self):
+        print(f"Prefix KV-cache: {self.prefix_cache_hits} hits, {self.prefix_cache_misses} misses, "
+              f"{self.prefix_tokens_reused} prompt tokens reused")
+        for size, rate in self.tokens_per_second().items():
+            print(f"  batch size {size}: {rate:.1f} tokens/sec")
@@ -0,0 +1,124 @@
+"""
+Log-Probability Module
+
+Stores per-token log-probabilities in a compact binary sidecar and computes
+per-response confidence statistics (mean entropy, perplexity).
+
+Sidecar layout: one flat float32 file. Each response occupies a block of
+n_tokens x (1 + top_k) values: the sampled token's logprob followed by the
+top_k alternatives (padded with -inf). The response dict in the JSON results
+only keeps a small reference {"offset", "n_tokens", "top_k"}.
+"""
+
+import os
+import numpy as np
+
+DEFAULT_SIDECAR_PATH = "results/experiment_logprobs.f32"
+LOGPROB_FEATURES = ["mean_entropy", "perplexity", "mean_logprob"]
+
+
+def parse_logprobs(logprobs: dict, top_k: int = 0) -> np.ndarray:
+    """
+    Convert an OpenAI-format logprobs object ({"content": [{"logprob", "top_logprobs"}]})
+    into an (n_tokens, 1 + top_k) float32 array.
+    """
+    tokens = (logprobs or {}).get("content") or []
+    block = np.full((len(tokens), 1 + top_k), -np.inf, dtype=np.float32)
+    for i, token in enumerate(tokens):
+        block[i, 0] = token.get("logprob", -np.inf)
+        alternatives = (token.get("top_logprobs") or [])[:top_k]
+        for j, alt in enumerate(alternatives):
+            block[i, 1 + j] = alt.get("logprob", -np.inf)
+    return block
+
+
+class LogprobStore:
+    """Append-only float32 sidecar file holding logprob blocks."""
+
+    def __init__(self, path: str = DEFAULT_SIDECAR_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def clear(self):
+        """Truncate the sidecar; references from earlier runs become invalid."""
+        open(self.path, "wb").close()
+
+    def append(self, block: np.ndarray) -> dict:
+        """Append a block and return its reference."""
+        block = np.ascontiguousarray(block, dtype=np.float32)
+        with open(self.path, "ab") as f:
+            offset = f.tell() // 4
+            f.write(block.tobytes())
+        return {"offset": offset, "n_tokens": int(block.shape[0]), "top_k": int(block.shape[1]) - 1}
+
+    def read(self, ref: dict) -> np.ndarray:
+        return self.read_many([ref])[0]
+
+    def read_many(self, refs: list) -> list:
+        """Read blocks for many references from a single memory map."""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return [None for _ in refs]
+        data = np.memmap(self.path, dtype=np.float32, mode="r")
+        blocks = []
+        for ref in refs:
+            if ref is None:
+                blocks.append(None)
+                continue
+            width = ref["top_k"] + 1
+            start = ref["offset"]
+            blocks.append(np.array(data[start:start + ref["n_tokens"] * width]).reshape(-1, width))
+        return blocks
+
+
+def attach_logprobs(response: dict, store: LogprobStore, top_k: int = 0) -> dict:
+    """Move raw logprobs from a query_model response into the sidecar, keeping a reference."""
+    raw = response.pop("logprobs", None)
+    if response.get("success") and raw:
+        block = parse_logprobs(raw, top_k)
+        if len(block):
+            response["logprobs_ref"] = store.append(block)
+    return response
+
+
+def response_statistics(blocks: list) -> dict:
+    """
+    Vectorized per-response statistics over logprob blocks.
+    mean_logprob: mean log-probability of the sampled tokens
+    perplexity: exp(-mean_logprob)
+    mean_entropy: mean per-token entropy of the top-k distribution (renormalized);
+        NaN when no alternatives were requested
+    Missing blocks give NaN.
+    """
+    n = len(blocks)
+    out = {name: np.full(n, np.nan) for name in LOGPROB_FEATURES}
+    present = [i for i, b in enumerate(blocks) if b is not None and len(b)]
+    if not present:
+        return out
+
+    width = max(blocks[i].shape[1] for i in present)
+    lengths = np.array([len(blocks[i]) for i in present])
+    tokens = np.full((lengths.sum(), width), -np.inf, dtype=np.float64)
+    start = 0
+    for i, length in zip(present, lengths):
+        tokens[start:start + length, :blocks[i].shape[1]] = blocks[i]
+        start += length
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+
+    mean_logprob = np.add.reduceat(tokens[:, 0], starts) / lengths
+    out["mean_logprob"][present] = mean_logprob
+    out["perplexity"][present] = np.exp(-mean_logprob)
+
+    if width > 1:
+        top = tokens[:, 1:]
+        probs = np.exp(top)
+        total = probs.sum(axis=1, keepdims=True)
+        q = np.divide(probs, total, out=np.zeros_like(probs), where=total > 0)
+        entropy = -np.where(q > 0, q * np.log(np.where(q > 0, q, 1.0)), 0.0).sum(axis=1)
+        valid = total[:, 0] > 0
+        counts = np.add.reduceat(valid.astype(np.float64), starts)
+        sums = np.add.reduceat(np.where(valid, entropy, 0.0), starts)
+        out["mean_entropy"][present] = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    return out
@@ -0,0 +1,209 @@
+"""
+Mixed-Effects Modelling Module
+
+Fits a random-effects model of the prompt-style effect for all features at once:
+
+    y = model + style + model x style + u_question + u_topic + e
+
+with random intercepts for question and topic. The covariance is
+V = sigma^2 (I + lam * Z H Z') with Z = [Z_q, Z_t] and H = diag(1, ..., rho, ...).
+By Woodbury and the matrix determinant lemma, every quantity the REML
+criterion needs (X'V^-1 X, X'V^-1 Y, y'V^-1 y, log|V|) follows from the
+sufficient statistics X'X, X'Y, y'y, Z'X, Z'Y and Z'Z, which are computed in
+one pass over the data. For each value of rho a single eigendecomposition of
+the (questions + topics) square matrix H^1/2 Z'Z H^1/2 is shared by every
+feature and every lam, so the REML criterion for all features and a whole grid
+of lam values is evaluated with batched linear algebra. No n x n matrix is
+formed, so the cost grows linearly with the number of responses.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse, stats
+
+RHO_GRID = [0.0, 0.1, 0.3, 1.0, 3.0, 10.0, 100.0]
+LAMBDA_GRID = np.concatenate([[0.0], np.logspace(-4, 4, 65)])
+
+
+def build_long_format(df: pd.DataFrame, features: list) -> tuple:
+    """
+    Stack human-style and LLM-style observations.
+    Returns (Y, meta): Y is (2 * rows, features); meta has model, id, topic, style (0/1).
+    """
+    n = len(df)
+    meta = pd.DataFrame({
+        "model": np.concatenate([df["model"].values, df["model"].values]),
+        "id": np.concatenate([df["id"].values, df["id"].values]),
+        "topic": np.concatenate([df["topic"].values, df["topic"].values]),
+        "style": np.concatenate([np.zeros(n), np.ones(n)]),
+    })
+    Y = np.vstack([
+        df[[f"human_{f}" for f in features]].values,
+        df[[f"llm_{f}" for f in features]].values,
+    ]).astype(np.float64)
+    return Y, meta
+
+
+def _indicator_matrix(labels) -> sparse.csr_matrix:
+    """Sparse one-hot matrix (rows x distinct labels)."""
+    codes, uniques = pd.factorize(labels, sort=True)
+    n = len(codes)
+    return sparse.csr_matrix((np.ones(n), (np.arange(n), codes)), shape=(n, len(uniques)))
+
+
+def design_matrices(meta: pd.DataFrame) -> tuple:
+    """
+    Fixed effects: intercept, model dummies, style, style x model dummies.
+    Returns (X, column_names, models, Z_question, Z_topic); the Z matrices are sparse.
+    """
+    models = sorted(meta["model"].unique())
+    style = meta["style"].values
+    columns = [np.ones(len(meta))]
+    names = ["intercept"]
+    for model in models[1:]:
+        columns.append((meta["model"].values == model).astype(float))
+        names.append(f"model[{model}]")
+    columns.append(style)
+    names.append("style")
+    for model in models[1:]:
+        columns.append(style * (meta["model"].values == model))
+        names.append(f"style:model[{model}]")
+    X = np.column_stack(columns)
+
+    Z_question = _indicator_matrix(meta["id"].values)
+    Z_topic = _indicator_matrix(meta["topic"].values)
+    return X, names, models, Z_question, Z_topic
+
+
+def _reml_grid(XtX: np.ndarray, XtY: np.ndarray, yty: np.ndarray, Rx: np.ndarray, Ry: np.ndarray,
+               s: np.ndarray, n: int, lambdas: np.ndarray) -> tuple:
+    """
+    REML criterion for every (lam, feature).
+    Rx = Q' H^1/2 Z'X and Ry = Q' H^1/2 Z'Y are the random-effects projections
+    rotated into the eigenbasis (eigenvalues s) of H^1/2 Z'Z H^1/2, so that
+    V^-1 / sigma^-2 = I - Z H^1/2 Q diag(c) Q' H^1/2 Z' with c = lam / (1 + lam * s).
+    Returns (reml (L, F), beta (L, p, F), A (L, p, p), sigma2 (L, F)).
+    """
+    p = XtX.shape[0]
+    c = lambdas[:, None] / (1.0 + np.outer(lambdas, s))     # (L, m)
+    A = XtX[None] - np.einsum("lm,mp,mq->lpq", c, Rx, Rx)
+    B = XtY[None] - np.einsum("lm,mp,mf->lpf", c, Rx, Ry)
+    beta = np.linalg.solve(A, B)
+    yWy = yty[None] - np.einsum("lm,mf->lf", c, Ry ** 2)
+    q = np.maximum(yWy - np.einsum("lpf,lpf->lf", B, beta), 1e-300)
+    sigma2 = q / (n - p)
+
+    _, logdet_A = np.linalg.slogdet(A)
+    logdet_V = np.log1p(np.outer(lambdas, s)).sum(axis=1)
+    reml = -0.5 * ((n - p) * np.log(sigma2) + (logdet_V + logdet_A)[:, None])
+    return reml, beta, A, sigma2
+
+
+def fit_style_mixed_models(df: pd.DataFrame, features: list,
+                           rho_grid: list = RHO_GRID, lambda_grid: np.ndarray = LAMBDA_GRID) -> pd.DataFrame:
+    """
+    Fit the random-effects model of prompt style for all features together.
+    Variance components are chosen by REML over a (rho, lam) grid.
+    Returns one row per feature and style contrast (overall and per model).
+    """
+    Y, meta = build_long_format(df, features)
+    X, names, models, Z_question, Z_topic = design_matrices(meta)
+    n, p = X.shape
+
+    # Constant features cannot be modelled; they are reported with NaN
+    scale = Y.std(axis=0)
+    usable = scale > 0
+    Ys = (Y[:, usable] - Y[:, usable].mean(axis=0)) / scale[usable]
+    n_features = Ys.shape[1]
+
+    # Sufficient statistics; everything below works in the (questions + topics) space
+    Z = sparse.hstack([Z_question, Z_topic]).tocsr()
+    n_question = Z_question.shape[1]
+    XtX, XtY, yty = X.T @ X, X.T @ Ys, (Ys ** 2).sum(axis=0)
+    ZtX, ZtY = Z.T @ X, Z.T @ Ys
+    ZtZ = (Z.T @ Z).toarray()
+
+    best_reml = np.full(n_features, -np.inf)
+    best = {
+        "beta": np.zeros((p, n_features)),
+        "cov_unscaled": np.zeros((p, p, n_features)),
+        "sigma2": np.zeros(n_features),
+        "lam": np.zeros(n_features),
+        "rho": np.zeros(n_features),
+    }
+
+    for rho in rho_grid:
+        h = np.ones(Z.shape[1])
+        h[n_question:] = np.sqrt(rho)
+        s, Q = np.linalg.eigh(h[:, None] * ZtZ * h[None, :])
+        s = np.clip(s, 0.0, None)
+        Rx, Ry = Q.T @ (h[:, None] * ZtX), Q.T @ (h[:, None] * ZtY)
+        reml, beta, A, sigma2 = _reml_grid(XtX, XtY, yty, Rx, Ry, s, n, lambda_grid)
+
+        idx = reml.argmax(axis=0)
+        cols = np.arange(n_features)
+        improved = reml[idx, cols] > best_reml
+        if not improved.any():
+            continue
+        best_reml[improved] = reml[idx, cols][improved]
+        best["beta"][:, improved] = beta[idx, :, cols][improved].T
+        A_inv = np.linalg.inv(A)
+        best["cov_unscaled"][:, :, improved] = np.moveaxis(A_inv[idx][improved], 0, -1)
+        best["sigma2"][improved] = sigma2[idx, cols][improved]
+        best["lam"][improved] = lambda_grid[idx][improved]
+        best["rho"][improved] = rho
+
+    # Style contrasts: overall (mean across models) and per model
+    style_col = names.index("style")
+    contrasts = {}
+    for i, model in enumerate(models):
+        c = np.zeros(p)
+        c[style_col] = 1.0
+        if i > 0:
+            c[names.index(f"style:model[{model}]")] = 1.0
+        contrasts[model] = c
+    overall = np.mean(list(contrasts.values()), axis=0)
+    contrasts = {"(all models)": overall, **contrasts}
+
+    dof = n - p
+    rows = []
+    usable_features = [f for f, u in zip(features, usable) if u]
+    for feature in features:
+        if feature not in usable_features:
+            for term in contrasts:
+                rows.append({"feature": feature, "model": term, "estimate": np.nan, "se": np.nan,
+                             "t_statistic": np.nan, "p_value": np.nan, "cohens_d": np.nan,
+                             "sigma2_question": np.nan, "sigma2_topic": np.nan,
+                             "sigma2_residual": np.nan, "n_obs": n})
+            continue
+
+        j = usable_features.index(feature)
+        unit = scale[features.index(feature)]
+        sigma2 = best["sigma2"][j]
+        lam, rho = best["lam"][j], best["rho"][j]
+        for term, c in contrasts.items():
+            estimate = c @ best["beta"][:, j]
+            se = np.sqrt(sigma2 * (c @ best["cov_unscaled"][:, :, j] @ c))
+            t_stat = estimate / se if se > 0 else np.nan
+            rows.append({
+                "feature": feature,
+                "model": term,
+                "estimate": estimate * unit,
+                "se": se * unit,
+                "t_statistic": t_stat,
+                "p_value": 2 * stats.t.sf(abs(t_stat), dof) if np.isfinite(t_stat) else np.nan,
+                # Effect relative to the residual (within-question) standard deviation
+                "cohens_d": estimate / np.sqrt(sigma2),
+                "sigma2_question": lam * sigma2 * unit ** 2,
+                "sigma2_topic": lam * rho * sigma2 * unit ** 2,
+                "sigma2_residual": sigma2 * unit ** 2,
+                "n_obs": n,
+            })
+
+    results = pd.DataFrame(rows)
+    overall_rows = results["model"] == "(all models)"
+    n_tests = len(features)
+    results["p_value_bonf"] = np.minimum(results["p_value"] * n_tests, 1.0)
+    results.loc[~overall_rows, "p_value_bonf"] = np.minimum(
+        results.loc[~overall_rows, "p_value"] * n_tests * len(models), 1.0)
+    return results
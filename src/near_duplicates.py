@@ -0,0 +1,198 @@
+"""
+Near-Duplicate Detection Module
+
+MinHash signatures with an LSH (banding) index over response texts.
+Finds responses that are near-identical across replicates, or that mostly
+echo the prompt template, without comparing every pair of responses.
+"""
+
+import re
+import zlib
+from collections import defaultdict
+import numpy as np
+
+from records import ResultTable
+
+NUM_PERM = 128
+NUM_BANDS = 32  # 4 rows per band -> candidate threshold around Jaccard 0.42
+SHINGLE_SIZE = 3
+DUPLICATE_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def shingles(text: str, k: int = SHINGLE_SIZE) -> set:
+    """Return the set of lowercased word k-grams of the text."""
+    words = re.findall(r"\w+", (text or "").lower())
+    if len(words) < k:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+class MinHasher:
+    """Computes MinHash signatures with universal hashing over crc32 shingle hashes."""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 42):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in shingles(text)], dtype=np.uint64)
+        if len(hashes) == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        permuted = ((np.outer(hashes, self.a) + self.b) % _MERSENNE_PRIME) & _MAX_HASH
+        return permuted.min(axis=0)
+
+    def signatures(self, texts: list) -> np.ndarray:
+        if len(texts) == 0:
+            return np.zeros((0, self.num_perm), dtype=np.uint64)
+        return np.vstack([self.signature(t) for t in texts])
+
+
+def estimate_jaccard(signature: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """Estimated Jaccard similarity between one signature and each row of others."""
+    return (np.atleast_2d(others) == signature).mean(axis=1)
+
+
+def pairwise_jaccard(signatures: np.ndarray) -> np.ndarray:
+    """Matrix of estimated Jaccard similarities between all signature rows."""
+    return (signatures[:, None, :] == signatures[None, :, :]).mean(axis=2)
+
+
+class MinHashLSHIndex:
+    """
+    LSH index over MinHash signatures.
+    Keys are arbitrary hashable values; optional metadata is kept per key.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, num_bands: int = NUM_BANDS, seed: int = 42):
+        if num_perm % num_bands != 0:
+            raise ValueError("num_perm must be divisible by num_bands")
+        self.hasher = MinHasher(num_perm, seed)
+        self.num_bands = num_bands
+        self.rows_per_band = num_perm // num_bands
+        self.buckets = [defaultdict(list) for _ in range(num_bands)]
+        self.keys = []
+        self.rows = {}
+        self.metadata = {}
+        self._signatures = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, text: str = None, signature: np.ndarray = None, metadata: dict = None):
+        """Add a text (or a precomputed signature) under the given key."""
+        if key in self.rows:
+            raise KeyError(f"Duplicate key: {key}")
+        if signature is None:
+            signature = self.hasher.signature(text)
+
+        row = len(self.keys)
+        self.keys.append(key)
+        self.rows[key] = row
+        self._signatures.append(signature)
+        if metadata is not None:
+            self.metadata[key] = metadata
+
+        for band, band_key in enumerate(self._band_keys(signature)):
+            self.buckets[band][band_key].append(row)
+
+    def signature_of(self, key) -> np.ndarray:
+        return self._signatures[self.rows[key]]
+
+    def query(self, text: str = None, threshold: float = 0.5, signature: np.ndarray = None) -> list:
+        """Return [(key, estimated_jaccard), ...] for indexed texts similar to the query."""
+        if signature is None:
+            signature = self.hasher.signature(text)
+
+        candidates = sorted(self._candidates(signature))
+        if not candidates:
+            return []
+
+        similarity = estimate_jaccard(signature, np.vstack([self._signatures[r] for r in candidates]))
+        matches = [(self.keys[r], float(s)) for r, s in zip(candidates, similarity) if s >= threshold]
+        return sorted(matches, key=lambda m: -m[1])
+
+    def similar_to(self, key, threshold: float = 0.5) -> list:
+        """Return indexed responses similar to an already indexed key (excluding itself)."""
+        matches = self.query(signature=self.signature_of(key), threshold=threshold)
+        return [m for m in matches if m[0] != key]
+
+    def duplicate_clusters(self, threshold: float = DUPLICATE_THRESHOLD, group_by=None) -> dict:
+        """
+        Group near-duplicates into clusters via union-find over LSH candidate pairs.
+        group_by maps a key to a group label; only keys in the same group are merged.
+        Returns {group: [cluster, ...]} with clusters of two or more keys.
+        """
+        if group_by is None:
+            group_by = lambda key: None
+
+        parent = list(range(len(self.keys)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        groups = [group_by(k) for k in self.keys]
+        for band_buckets in self.buckets:
+            for rows in band_buckets.values():
+                for i, a in enumerate(rows):
+                    for b in rows[i + 1:]:
+                        if groups[a] != groups[b] or find(a) == find(b):
+                            continue
+                        sim = (self._signatures[a] == self._signatures[b]).mean()
+                        if sim >= threshold:
+                            parent[find(b)] = find(a)
+
+        members = defaultdict(list)
+        for row in range(len(self.keys)):
+            members[find(row)].append(row)
+
+        clusters = defaultdict(list)
+        for rows in members.values():
+            if len(rows) > 1:
+                clusters[groups[rows[0]]].append([self.keys[r] for r in rows])
+        return dict(clusters)
+
+    def _band_keys(self, signature: np.ndarray) -> list:
+        r = self.rows_per_band
+        return [signature[b * r:(b + 1) * r].tobytes() for b in range(self.num_bands)]
+
+    def _candidates(self, signature: np.ndarray) -> set:
+        candidates = set()
+        for band, band_key in enumerate(self._band_keys(signature)):
+            candidates.update(self.buckets[band].get(band_key, ()))
+        return candidates
+
+
+def build_response_index(results, num_perm: int = NUM_PERM, num_bands: int = NUM_BANDS) -> MinHashLSHIndex:
+    """
+    Build an LSH index over all successful responses in a results dict or ResultTable.
+    Keys are (record_index, style) with style in {"human", "llm"}.
+    """
+    table = ResultTable.from_results(results)
+    index = MinHashLSHIndex(num_perm, num_bands)
+    signature_cache = {}  # Repeated texts share one TextStore ref
+    for i, r in enumerate(table):
+        for style in ("human", "llm"):
+            response = r.response(style)
+            if not response.success:
+                continue
+            ref = response.content_ref
+            if ref not in signature_cache:
+                signature_cache[ref] = index.hasher.signature(table.text(ref))
+            index.add((i, style), signature=signature_cache[ref],
+                      metadata={"model": r.model, "id": r.id, "style": style})
+    return index
+
+
+def duplicate_clusters_by_question(index: MinHashLSHIndex, threshold: float = DUPLICATE_THRESHOLD) -> dict:
+    """Near-duplicate clusters per (model, question id) for an index built by build_response_index."""
+    return index.duplicate_clusters(
+        threshold, group_by=lambda key: (index.metadata[key]["model"], index.metadata[key]["id"])
+    )
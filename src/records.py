@@ -0,0 +1,200 @@
+"""
+Result Records Module
+
+Compact typed in-memory representation of experiment results.
+
+Prompts, questions and responses are held once in a TextStore and referenced
+by integer index; model and topic names are interned. The runner and the
+analysis share one ResultTable instead of copying nested dicts between
+stages. The JSON file format written by run_experiment is unchanged.
+"""
+
+import sys
+import json
+from dataclasses import dataclass
+
+STYLES = ("human", "llm")
+
+# Incremental JSONL output written by run_experiment and followed by live_analysis.py
+STREAM_PATH = "results/experiment_results.jsonl"
+
+# Response keys that have dedicated slots; everything else goes to `extra`
+_RESPONSE_FIELDS = ("success", "content", "error", "model", "usage", "finish_reason")
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class TextStore:
+    """Append-only store of unique texts referenced by integer index (-1 = no text)."""
+
+    def __init__(self):
+        self.texts = []
+        self._refs = {}
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, ref: int):
+        return self.get(ref)
+
+    def add(self, text) -> int:
+        if text is None:
+            return -1
+        ref = self._refs.get(text)
+        if ref is None:
+            ref = len(self.texts)
+            self.texts.append(text)
+            self._refs[text] = ref
+        return ref
+
+    def get(self, ref: int):
+        return None if ref < 0 else self.texts[ref]
+
+
+@dataclass(slots=True)
+class Response:
+    """One model response; content is a reference into the TextStore."""
+    success: bool
+    content_ref: int = -1
+    error: str = None
+    model: str = None
+    usage: dict = None
+    finish_reason: str = None
+    extra: dict = None
+
+    @classmethod
+    def from_dict(cls, response: dict, store: TextStore) -> "Response":
+        extra = {k: v for k, v in response.items() if k not in _RESPONSE_FIELDS}
+        return cls(
+            success=bool(response.get("success")),
+            content_ref=store.add(response.get("content")),
+            error=response.get("error"),
+            model=_intern(response.get("model")),
+            usage=response.get("usage"),
+            finish_reason=_intern(response.get("finish_reason")),
+            extra=extra or None,
+        )
+
+    def to_dict(self, store: TextStore) -> dict:
+        out = {"success": self.success, "content": store.get(self.content_ref)}
+        if self.error is not None:
+            out["error"] = self.error
+        if self.model is not None:
+            out["model"] = self.model
+        if self.usage is not None:
+            out["usage"] = self.usage
+        if self.finish_reason is not None:
+            out["finish_reason"] = self.finish_reason
+        if self.extra:
+            out.update(self.extra)
+        return out
+
+
+@dataclass(slots=True)
+class ResultRecord:
+    """Paired human-style / LLM-style result for one (model, question)."""
+    id: int
+    topic: str
+    model: str
+    question_ref: int
+    human_prompt_ref: int
+    llm_prompt_ref: int
+    human_response: Response
+    llm_response: Response
+    timestamp: str
+
+    def response(self, style: str) -> Response:
+        return self.human_response if style == "human" else self.llm_response
+
+    def prompt_ref(self, style: str) -> int:
+        return self.human_prompt_ref if style == "human" else self.llm_prompt_ref
+
+    @property
+    def success(self) -> bool:
+        return self.human_response.success and self.llm_response.success
+
+
+class ResultTable:
+    """Collection of ResultRecords sharing a single TextStore."""
+
+    def __init__(self, store: TextStore = None):
+        self.store = store if store is not None else TextStore()
+        self.records = []
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, i: int) -> ResultRecord:
+        return self.records[i]
+
+    def text(self, ref: int):
+        return self.store.get(ref)
+
+    def add(self, pair: dict, model: str, human_response: dict, llm_response: dict,
+            timestamp: str) -> ResultRecord:
+        """Add a result from a prompt pair and the two raw response dicts."""
+        record = ResultRecord(
+            id=pair["id"],
+            topic=_intern(pair["topic"]),
+            model=_intern(model),
+            question_ref=self.store.add(pair["base_question"]),
+            human_prompt_ref=self.store.add(pair["human_style_prompt"]),
+            llm_prompt_ref=self.store.add(pair["llm_style_prompt"]),
+            human_response=Response.from_dict(human_response, self.store),
+            llm_response=Response.from_dict(llm_response, self.store),
+            timestamp=timestamp,
+        )
+        self.records.append(record)
+        return record
+
+    def add_result_dict(self, result: dict) -> ResultRecord:
+        """Add a result in the JSON format written by run_experiment."""
+        return self.add(result, result["model"], result["human_style_response"],
+                        result["llm_style_response"], result.get("timestamp"))
+
+    def record_to_dict(self, record: ResultRecord) -> dict:
+        return {
+            "id": record.id,
+            "topic": record.topic,
+            "base_question": self.text(record.question_ref),
+            "model": record.model,
+            "human_style_prompt": self.text(record.human_prompt_ref),
+            "llm_style_prompt": self.text(record.llm_prompt_ref),
+            "human_style_response": record.human_response.to_dict(self.store),
+            "llm_style_response": record.llm_response.to_dict(self.store),
+            "timestamp": record.timestamp,
+        }
+
+    def to_dicts(self) -> list:
+        """Materialize all records in the JSON result format."""
+        return [self.record_to_dict(r) for r in self.records]
+
+    def write_json(self, path: str, experiment_config: dict):
+        """Write the table in run_experiment's JSON format, one record at a time."""
+        head = json.dumps({"experiment_config": experiment_config}, indent=2)[:-2]
+        with open(path, "w") as f:
+            f.write(head + ',\n  "results": [')
+            for i, record in enumerate(self.records):
+                body = json.dumps(self.record_to_dict(record), indent=2).replace("\n", "\n    ")
+                f.write(("," if i else "") + "\n    " + body)
+            f.write("\n  ]\n}" if self.records else "]\n}")
+
+    @classmethod
+    def from_results(cls, results) -> "ResultTable":
+        """
+        Build a table from a loaded results dict.
+        Existing tables (or output dicts holding one) are passed through.
+        """
+        if isinstance(results, ResultTable):
+            return results
+        if isinstance(results.get("results"), ResultTable):
+            return results["results"]
+        table = cls()
+        for r in results["results"]:
+            table.add_result_dict(r)
+        return table
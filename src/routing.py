@@ -0,0 +1,200 @@
+"""
+Multi-Provider Routing Module
+
+Sends each logical model (e.g. "openai/gpt-4.1-mini") to one of several
+OpenAI-compatible endpoints, such as OpenRouter and a local server.
+
+Each endpoint keeps a health record and an EWMA of its latency. New work goes
+to the fastest healthy endpoint that serves the model (endpoints without any
+latency sample are tried first, unless they have only failed so far). Failed
+requests, including rate-limited ones (HTTP 429), move on to the next endpoint
+straight away; only the last endpoint retries with backoff. An endpoint that
+fails repeatedly is put in a cooldown. The endpoint that served each response
+is recorded in the response dict.
+
+Endpoint config file (JSON list):
+    [
+      {"name": "openrouter", "url": "https://openrouter.ai/api/v1/chat/completions",
+       "api_key_env": "OPENROUTER_API_KEY"},
+      {"name": "local", "url": "http://localhost:8000/v1/chat/completions",
+       "models": {"openai/gpt-4.1-mini": "gpt-4.1-mini"}}
+    ]
+"models" maps logical model ids to the endpoint's own ids; without it the
+endpoint serves every model under its logical id.
+"""
+
+import os
+import json
+import time
+from dataclasses import dataclass
+
+from backends import ModelBackend, MODELS, OPENROUTER_BASE_URL, query_model
+
+EWMA_ALPHA = 0.3
+MAX_CONSECUTIVE_FAILURES = 3
+COOLDOWN_SECONDS = 60.0
+
+
+@dataclass
+class Endpoint:
+    """An OpenAI-compatible chat completions endpoint."""
+    name: str
+    url: str
+    api_key_env: str = None
+    models: dict = None
+
+    def model_id(self, model: str):
+        """Endpoint-specific id for a logical model (None if not served)."""
+        if self.models is None:
+            return model
+        return self.models.get(model)
+
+    def api_key(self):
+        return os.getenv(self.api_key_env, "") if self.api_key_env else ""
+
+
+@dataclass(slots=True)
+class EndpointHealth:
+    ewma_latency: float = None
+    successes: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    cooldown_until: float = 0.0
+    last_error: str = None
+
+
+DEFAULT_ENDPOINTS = [Endpoint("openrouter", OPENROUTER_BASE_URL, "OPENROUTER_API_KEY")]
+
+
+def load_endpoints(path: str) -> list:
+    """Load endpoints from a JSON config file."""
+    with open(path, "r") as f:
+        return [Endpoint(**entry) for entry in json.load(f)]
+
+
+class Router:
+    """Latency-aware endpoint selection with health tracking and failover."""
+
+    def __init__(self, endpoints: list = None, alpha: float = EWMA_ALPHA,
+                 max_failures: int = MAX_CONSECUTIVE_FAILURES, cooldown: float = COOLDOWN_SECONDS):
+        self.endpoints = list(endpoints or DEFAULT_ENDPOINTS)
+        self.alpha = alpha
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.health = {e.name: EndpointHealth() for e in self.endpoints}
+        self.failovers = 0
+
+    def is_healthy(self, endpoint: Endpoint, now: float = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return self.health[endpoint.name].cooldown_until <= now
+
+    @staticmethod
+    def _latency_rank(health: EndpointHealth) -> float:
+        if health.ewma_latency is not None:
+            return health.ewma_latency
+        return 0.0 if health.failures == 0 else float("inf")
+
+    def candidates(self, model: str) -> list:
+        """
+        Endpoints serving the model, in the order they should be tried:
+        healthy ones by EWMA latency (unmeasured first, or last if they have
+        only failed), then those in cooldown by how soon the cooldown ends.
+        """
+        now = time.monotonic()
+        serving = [e for e in self.endpoints if e.model_id(model) is not None]
+        healthy = [e for e in serving if self.is_healthy(e, now)]
+        cooling = [e for e in serving if not self.is_healthy(e, now)]
+        healthy.sort(key=lambda e: self._latency_rank(self.health[e.name]))
+        cooling.sort(key=lambda e: self.health[e.name].cooldown_until)
+        return healthy + cooling
+
+    def record_success(self, endpoint: Endpoint, latency: float):
+        health = self.health[endpoint.name]
+        health.successes += 1
+        health.consecutive_failures = 0
+        health.cooldown_until = 0.0
+        if health.ewma_latency is None:
+            health.ewma_latency = latency
+        else:
+            health.ewma_latency = self.alpha * latency + (1 - self.alpha) * health.ewma_latency
+
+    def record_failure(self, endpoint: Endpoint, error: str):
+        health = self.health[endpoint.name]
+        health.failures += 1
+        health.consecutive_failures += 1
+        health.last_error = error
+        if health.consecutive_failures >= self.max_failures:
+            health.cooldown_until = time.monotonic() + self.cooldown
+
+    def query(self, model: str, prompt: str, **options) -> dict:
+        """Query the best endpoint for the model, failing over to the others on errors."""
+        candidates = self.candidates(model)
+        if not candidates:
+            return {"success": False, "error": f"No endpoint serves {model}", "content": None, "endpoint": None}
+
+        errors = []
+        for position, endpoint in enumerate(candidates):
+            # Fail over at once (e.g. on HTTP 429); only the last endpoint retries with backoff
+            attempt_options = options if position == len(candidates) - 1 else {**options, "max_retries": 1}
+            start = time.monotonic()
+            response = query_model(endpoint.model_id(model), prompt, url=endpoint.url,
+                                   api_key=endpoint.api_key(), **attempt_options)
+            latency = time.monotonic() - start
+            response["endpoint"] = endpoint.name
+            if errors:
+                response["failed_endpoints"] = errors
+            if response["success"]:
+                self.record_success(endpoint, latency)
+                return response
+
+            self.record_failure(endpoint, response.get("error"))
+            errors.append({"endpoint": endpoint.name, "error": response.get("error")})
+            if len(errors) < len(candidates):
+                self.failovers += 1
+
+        return response
+
+    def describe(self) -> dict:
+        return {
+            "failovers": self.failovers,
+            "endpoints": {
+                e.name: {
+                    "url": e.url,
+                    "ewma_latency_s": self.health[e.name].ewma_latency,
+                    "successes": self.health[e.name].successes,
+                    "failures": self.health[e.name].failures,
+                }
+                for e in self.endpoints
+            },
+        }
+
+
+class RoutedBackend(ModelBackend):
+    """Generation backend that sends every prompt through a Router."""
+    name = "routed"
+
+    def __init__(self, router: Router = None, logprobs: bool = False, top_logprobs: int = 0,
+                 delay: float = 0.5):
+        self.router = router if router is not None else Router()
+        self.query_options = {"logprobs": logprobs, "top_logprobs": top_logprobs if logprobs else 0}
+        self.delay = delay
+
+    def default_models(self) -> list:
+        return MODELS
+
+    def generate(self, model: str, prompts: list) -> list:
+        responses = []
+        for prompt in prompts:
+            responses.append(self.router.query(model, prompt, **self.query_options))
+            time.sleep(self.delay)  # Small delay to avoid rate limiting
+        return responses
+
+    def describe(self) -> dict:
+        return {"name": self.name, **self.router.describe()}
+
+    def print_report(self):
+        print(f"Failovers: {self.router.failovers}")
+        for name, stats in self.router.describe()["endpoints"].items():
+            latency = stats["ewma_latency_s"]
+            latency_str = f"{latency:.2f}s" if latency is not None else "n/a"
+            print(f"  {name}: {stats['successes']} ok, {stats['failures']} failed, EWMA latency {latency_str}")
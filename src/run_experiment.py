@@ -5,145 +5,105 @@ Tests whether LLMs behave differently when prompted with human-style vs LLM-styl
 Uses OpenRouter API to access multiple models.
 """
 
-import os
 import json
-import time
 import random
 from datetime import datetime
 from tqdm import tqdm
-import httpx
 
 from prompt_pairs import get_prompt_pairs
+from records import STREAM_PATH, ResultTable
+from logprobs import DEFAULT_SIDECAR_PATH, LogprobStore, attach_logprobs
+from hedging import HedgingPolicy
+from backends import MODELS, TEMPERATURE, MAX_TOKENS, TOP_P, SEED, ModelBackend, OpenRouterBackend, query_model
 
-# Configuration
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1/chat/completions"
+# Maximum alternatives per token when logprobs are requested
+TOP_LOGPROBS = 5
 
-# Models to test
-MODELS = [
-    "openai/gpt-4.1-mini",       # GPT-4.1 mini for faster testing
-    "anthropic/claude-sonnet-4", # Claude Sonnet 4
-]
-
-# Sampling parameters
-TEMPERATURE = 0.7
-MAX_TOKENS = 500
-TOP_P = 0.95
-
-# Random seed
-SEED = 42
 random.seed(SEED)
 
 
-def query_model(model: str, prompt: str, max_retries: int = 3) -> dict:
-    """
-    Query a model via OpenRouter API.
-    Returns response dict with content and metadata.
-    """
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://research.experiment.local",
-        "X-Title": "LLM Human vs LLM Style Research"
-    }
-
-    data = {
-        "model": model,
-        "messages": [
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": TEMPERATURE,
-        "max_tokens": MAX_TOKENS,
-        "top_p": TOP_P,
-    }
-
-    for attempt in range(max_retries):
-        try:
-            with httpx.Client(timeout=60.0) as client:
-                response = client.post(OPENROUTER_BASE_URL, headers=headers, json=data)
-                response.raise_for_status()
-                result = response.json()
-
-                return {
-                    "success": True,
-                    "content": result["choices"][0]["message"]["content"],
-                    "model": result.get("model", model),
-                    "usage": result.get("usage", {}),
-                    "finish_reason": result["choices"][0].get("finish_reason", "unknown"),
-                }
-
-        except httpx.HTTPStatusError as e:
-            if e.response.status_code == 429:
-                wait_time = 2 ** (attempt + 1)  # Exponential backoff
-                print(f"Rate limited. Waiting {wait_time}s...")
-                time.sleep(wait_time)
-            else:
-                return {
-                    "success": False,
-                    "error": f"HTTP {e.response.status_code}: {str(e)}",
-                    "content": None,
-                }
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "content": None,
-            }
-
-    return {
-        "success": False,
-        "error": "Max retries exceeded",
-        "content": None,
-    }
-
-
-def run_experiment(num_questions: int = 50, models: list = None):
+def run_experiment(num_questions: int = 50, models: list = None, logprobs: bool = False,
+                   top_logprobs: int = TOP_LOGPROBS, logprobs_path: str = DEFAULT_SIDECAR_PATH,
+                   hedging: HedgingPolicy = None, stream_path: str = STREAM_PATH,
+                   backend: ModelBackend = None):
     """
     Run the main experiment.
     For each question, query each model with both human-style and LLM-style prompts.
+    Generation goes through backend (default: OpenRouterBackend); each
+    generate_batches() call receives backend.pairs_per_call prompt pairs (all of
+    a model's pairs when it is None, so a batching backend can group them) and
+    results are recorded batch by batch as they finish.
+    With logprobs=True, per-token logprobs are requested and written to a binary
+    sidecar at logprobs_path (truncated at the start of the run); responses keep
+    only a "logprobs_ref".
+    With a HedgingPolicy, slow requests are hedged; each response records its
+    latency and hedge outcome, and the totals are saved in the experiment config.
+    Each result is also appended to the JSONL file at stream_path as soon as it
+    arrives, so live_analysis.py can follow the sweep.
     """
+    if backend is None:
+        backend = OpenRouterBackend(logprobs, top_logprobs, hedging)
     if models is None:
-        models = MODELS
+        models = backend.default_models()
+
+    logprob_store = None
+    if logprobs:
+        # The results file is rewritten by every run, so start a fresh sidecar too
+        logprob_store = LogprobStore(logprobs_path)
+        logprob_store.clear()
 
     prompt_pairs = get_prompt_pairs()[:num_questions]
-    results = []
+    pairs_per_call = backend.pairs_per_call or max(len(prompt_pairs), 1)
+    results = ResultTable()
     timestamp = datetime.now().isoformat()
 
     print(f"\n{'='*60}")
     print(f"Running LLM Human vs LLM Style Experiment")
     print(f"{'='*60}")
     print(f"Timestamp: {timestamp}")
+    print(f"Backend: {backend.name}")
     print(f"Models: {models}")
     print(f"Questions: {num_questions}")
     print(f"Total API calls: {num_questions * len(models) * 2}")
     print(f"{'='*60}\n")
 
+    stream = open(stream_path, "w") if stream_path else None
+
     for model in models:
         print(f"\n--- Testing model: {model} ---\n")
 
-        for pair in tqdm(prompt_pairs, desc=f"Processing {model}"):
-            # Query with human-style prompt
-            human_response = query_model(model, pair["human_style_prompt"])
-            time.sleep(0.5)  # Small delay to avoid rate limiting
-
-            # Query with LLM-style prompt
-            llm_response = query_model(model, pair["llm_style_prompt"])
-            time.sleep(0.5)
-
-            result = {
-                "id": pair["id"],
-                "topic": pair["topic"],
-                "base_question": pair["base_question"],
-                "model": model,
-                "human_style_prompt": pair["human_style_prompt"],
-                "llm_style_prompt": pair["llm_style_prompt"],
-                "human_style_response": human_response,
-                "llm_style_response": llm_response,
-                "timestamp": datetime.now().isoformat(),
-            }
-            results.append(result)
-
-    # Save results
+        with tqdm(total=len(prompt_pairs), desc=f"Processing {model}") as progress:
+            for start in range(0, len(prompt_pairs), pairs_per_call):
+                chunk = prompt_pairs[start:start + pairs_per_call]
+
+                # Human-style and LLM-style prompts of each pair, interleaved
+                prompts = [p for pair in chunk for p in (pair["human_style_prompt"], pair["llm_style_prompt"])]
+
+                # A record is written as soon as both responses of its pair have arrived
+                pending = {}
+                for indices, responses in backend.generate_batches(model, prompts):
+                    for index, response in zip(indices, responses):
+                        pending[index] = response
+                        i = index // 2
+                        if 2 * i not in pending or 2 * i + 1 not in pending:
+                            continue
+                        human_response, llm_response = pending.pop(2 * i), pending.pop(2 * i + 1)
+
+                        if logprob_store is not None:
+                            attach_logprobs(human_response, logprob_store, top_logprobs)
+                            attach_logprobs(llm_response, logprob_store, top_logprobs)
+
+                        record = results.add(chunk[i], model, human_response, llm_response,
+                                             datetime.now().isoformat())
+                        if stream is not None:
+                            stream.write(json.dumps(results.record_to_dict(record)) + "\n")
+                            stream.flush()
+                        progress.update(1)
+
+    if stream is not None:
+        stream.close()
+
+    # Save results (records are written one at a time from the shared table)
     output = {
         "experiment_config": {
             "timestamp": timestamp,
@@ -153,23 +113,54 @@ def run_experiment(num_questions: int = 50, models: list = None):
             "max_tokens": MAX_TOKENS,
             "top_p": TOP_P,
             "seed": SEED,
+            "logprobs": logprobs,
+            "top_logprobs": top_logprobs if logprobs else 0,
+            "logprobs_path": logprobs_path if logprobs else None,
+            "backend": backend.describe(),
         },
         "results": results,
     }
 
     output_path = "results/experiment_results.json"
-    with open(output_path, "w") as f:
-        json.dump(output, f, indent=2)
+    results.write_json(output_path, output["experiment_config"])
 
     print(f"\n\nResults saved to {output_path}")
 
     # Print summary
-    successful = sum(1 for r in results if r["human_style_response"]["success"] and r["llm_style_response"]["success"])
+    successful = sum(1 for r in results if r.success)
     print(f"\nSuccessful query pairs: {successful}/{len(results)}")
+    backend.print_report()
 
     return output
 
 
 if __name__ == "__main__":
-    # Run experiment with all 50 questions and both models
-    run_experiment(num_questions=50, models=MODELS)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the human vs LLM prompt style experiment")
+    parser.add_argument("--num-questions", type=int, default=50)
+    parser.add_argument("--backend", default="openrouter", choices=["openrouter", "local", "routed"],
+                        help="openrouter (API), local (in-process CPU model, works offline) "
+                             "or routed (multiple endpoints with failover)")
+    parser.add_argument("--endpoints", default=None, help="JSON endpoint config for the routed backend")
+    parser.add_argument("--local-model", default=None, help="Hugging Face model id for the local backend")
+    parser.add_argument("--batch-size", type=int, default=None, help="Prompts per padded generation batch (local backend)")
+    args = parser.parse_args()
+
+    if args.backend == "local":
+        from local_backend import LocalCausalLMBackend
+
+        local_options = {}
+        if args.local_model:
+            local_options["model_name"] = args.local_model
+        if args.batch_size:
+            local_options["batch_size"] = args.batch_size
+        run_experiment(num_questions=args.num_questions, backend=LocalCausalLMBackend(**local_options))
+    elif args.backend == "routed":
+        from routing import Router, RoutedBackend, load_endpoints
+
+        endpoints = load_endpoints(args.endpoints) if args.endpoints else None
+        run_experiment(num_questions=args.num_questions, models=MODELS, backend=RoutedBackend(Router(endpoints)))
+    else:
+        # Run experiment with all 50 questions and both models
+        run_experiment(num_questions=args.num_questions, models=MODELS)